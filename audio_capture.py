@@ -0,0 +1,153 @@
+import time
+import threading
+from audio_source import MicrophoneSource
+
+# Picovoice engines (Porcupine and Cobra) both consume 512-sample frames at 16 kHz
+CAPTURE_FRAME_LENGTH = 512
+CAPTURE_BUFFER_SECONDS = 10
+
+
+class AudioCapture:
+    """Owns the microphone and shares its frames with any number of readers.
+
+    A single capture thread keeps the device running for the life of the assistant and writes
+    each frame into a fixed-size ring buffer. Readers keep their own position in the ring, so
+    handing audio from one consumer to another (wake word -> recorder) is just passing the
+    reader on: no device restart and no frames lost in between.
+
+    Any object with start/stop/read/delete and sample_rate can stand in for the microphone
+    (see audio_source.py); capture stops when its read() returns None.
+    """
+
+    def __init__(self, device_index=-1, frame_length=CAPTURE_FRAME_LENGTH, buffer_seconds=CAPTURE_BUFFER_SECONDS,
+                 source=None):
+        self.source = source or MicrophoneSource(frame_length, device_index)
+        self.frame_length = frame_length
+        self.sample_rate = self.source.sample_rate
+        self.capacity = max(int(buffer_seconds * self.sample_rate / frame_length), 2)
+        self.frames = [None] * self.capacity
+        self.written = 0  # Total frames captured; only the capture thread advances it
+        self.new_frame = threading.Condition()
+        self.running = False
+        self.thread = None
+
+    def start(self):
+        if self.running:
+            return
+        self.running = True
+        self.source.start()
+        self.thread = threading.Thread(target=self._capture, daemon=True)
+        self.thread.start()
+        print(f"Microphone capture started ({self.sample_rate} Hz, {self.frame_length} samples per frame)")
+
+    def stop(self):
+        self.running = False
+        with self.new_frame:
+            self.new_frame.notify_all()
+        if self.thread:
+            self.thread.join()
+            self.thread = None
+
+    def reader(self, frame_length=None):
+        """A new reader positioned at the next frame to be captured."""
+        if frame_length is not None and frame_length != self.frame_length:
+            raise ValueError(f"Capture frame length is {self.frame_length}, consumer needs {frame_length}")
+        return CaptureReader(self, self.written)
+
+    def _capture(self):
+        try:
+            while self.running:
+                pcm = self.source.read()
+                if pcm is None:
+                    break  # End of a replayed recording
+                # Fill the slot before publishing it; readers never look past `written`
+                self.frames[self.written % self.capacity] = pcm
+                self.written += 1
+                with self.new_frame:
+                    self.new_frame.notify_all()
+        finally:
+            self.running = False
+            self.source.stop()
+            with self.new_frame:
+                self.new_frame.notify_all()
+
+    def __del__(self):
+        self.stop()
+        if self.source is not None:
+            self.source.delete()
+
+
+class CaptureReader:
+    """One consumer's position in an AudioCapture ring buffer."""
+
+    def __init__(self, capture, position):
+        self.capture = capture
+        self.position = position
+        self.dropped = 0  # Frames overwritten before this reader got to them
+
+    def read(self, timeout=None):
+        """Return the next frame, blocking until it is captured. Returns None on timeout or when capture stops."""
+        capture = self.capture
+        while True:
+            if self.position >= capture.written:
+                with capture.new_frame:
+                    if not capture.new_frame.wait_for(
+                            lambda: self.position < capture.written or not capture.running, timeout):
+                        return None
+                if self.position >= capture.written:
+                    return None  # Capture stopped
+
+            oldest = capture.written - capture.capacity
+            if self.position < oldest:
+                self._skip_to(oldest)
+            frame = capture.frames[self.position % capture.capacity]
+            # The slot may have been overwritten while it was read; if so, catch up and try again
+            if self.position >= capture.written - capture.capacity:
+                self.position += 1
+                return frame
+
+    def previous(self, count):
+        """The last `count` frames before the one just read (oldest first), as far as the ring still holds them."""
+        capture = self.capture
+        end = self.position - 1
+        start = max(end - count, capture.written - capture.capacity + 1, 0)
+        return [capture.frames[index % capture.capacity] for index in range(start, end)]
+
+    def skip_to_latest(self):
+        """Discard anything not yet read, so the next read() returns freshly captured audio."""
+        self.position = self.capture.written
+
+    def _skip_to(self, position):
+        skipped = position - self.position
+        self.dropped += skipped
+        self.position = position
+        print(f"Audio reader fell behind, skipped {skipped} frames")
+
+
+def test_audio_capture(seconds=3):
+    """Read from two consumers at once and check that neither misses a frame."""
+    capture = AudioCapture()
+    capture.start()
+    readers = [capture.reader(), capture.reader()]
+    counts = [0, 0]
+
+    def consume(index):
+        end_time = time.time() + seconds
+        while time.time() < end_time:
+            if readers[index].read(timeout=1.0) is not None:
+                counts[index] += 1
+
+    threads = [threading.Thread(target=consume, args=(index,)) for index in range(2)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    capture.stop()
+
+    expected = seconds * capture.sample_rate / capture.frame_length
+    for index, reader in enumerate(readers):
+        print(f"Reader {index}: {counts[index]} frames (~{expected:.0f} expected), {reader.dropped} dropped")
+
+
+if __name__ == "__main__":
+    test_audio_capture()
@@ -0,0 +1,46 @@
+import io
+import time
+
+try:
+    from pydub import AudioSegment
+except ImportError:
+    AudioSegment = None
+
+# Formats Gemini accepts inline, with the pydub export arguments used to produce them
+UPLOAD_FORMATS = {
+    "opus": ("audio/ogg", {"format": "ogg", "codec": "libopus", "bitrate": "24k"}),
+    "flac": ("audio/flac", {"format": "flac"}),
+    "wav": ("audio/wav", None),
+}
+
+# Used to estimate how much upload time the smaller payload saves
+UPLINK_KBITS_PER_SECOND = 1000
+
+
+def encode_for_upload(wav_bytes, upload_format="opus"):
+    """Encode a WAV recording into a compact format for upload. Returns (data, mime_type).
+
+    Falls back to the original WAV if pydub (or ffmpeg behind it) is not available.
+    """
+    mime_type, export_args = UPLOAD_FORMATS[upload_format]
+    if export_args is None:
+        return wav_bytes, mime_type
+    if AudioSegment is None:
+        print("pydub not installed, uploading audio as WAV.")
+        return wav_bytes, "audio/wav"
+
+    start_time = time.time()
+    try:
+        segment = AudioSegment.from_file(io.BytesIO(wav_bytes), format="wav")
+        buffer = io.BytesIO()
+        segment.export(buffer, **export_args)
+        data = buffer.getvalue()
+    except Exception as e:
+        print(f"Error encoding audio as {upload_format}, uploading as WAV: {str(e)}")
+        return wav_bytes, "audio/wav"
+
+    saved = len(wav_bytes) - len(data)
+    upload_seconds_saved = saved * 8 / (UPLINK_KBITS_PER_SECOND * 1000)
+    print(f"Encoded audio as {upload_format} in {time.time() - start_time:.2f}s: {len(wav_bytes)} -> {len(data)} bytes "
+          f"({saved} saved, ~{upload_seconds_saved:.2f}s less upload at {UPLINK_KBITS_PER_SECOND} kbit/s)")
+    return data, mime_type
@@ -1,80 +1,165 @@
-import pvrecorder
 import pvcobra
+import io
 import wave
+from array import array
 from datetime import datetime
-import struct
 from dotenv import load_dotenv
 import os
 import time
+import threading
+from audio_capture import AudioCapture
+from endpointer import Endpointer
+
+# Silence kept either side of the detected speech when trimming, in seconds
+TRIM_LEADING_PADDING = 0.2
+TRIM_TRAILING_PADDING = 0.3
+
+# Audio from just before speech was detected that is kept, so the first syllable isn't clipped
+PRE_ROLL_SECONDS = 0.3
+
+# End utterances early once the silence is clearly longer than the speaker's usual pauses
+ADAPTIVE_ENDPOINTING = True
+
+# Keep a copy of every recording in voice_recordings/ (written in the background)
+SAVE_RECORDINGS = True
+
+
+class RecordedAudio:
+    """A recording held in memory as 16-bit mono samples, so it can be uploaded without a round trip to disk."""
+
+    def __init__(self, samples, sample_rate, sample_width=2, channels=1):
+        self.samples = samples  # array('h')
+        self.sample_rate = sample_rate
+        self.sample_width = sample_width
+        self.channels = channels
+        self.path = None  # Set once the recording has been saved
+
+    def __len__(self):
+        return len(self.samples)
+
+    @property
+    def duration(self):
+        return len(self.samples) / self.sample_rate
+
+    def to_wav_bytes(self):
+        buffer = io.BytesIO()
+        self._write_wav(buffer)
+        return buffer.getvalue()
+
+    def save(self, path):
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self._write_wav(path)
+        self.path = path
+        return path
+
+    def _write_wav(self, target):
+        with wave.open(target, 'wb') as wf:
+            wf.setnchannels(self.channels)
+            wf.setsampwidth(self.sample_width)
+            wf.setframerate(self.sample_rate)
+            wf.writeframes(self.samples.tobytes())
+
 
 class AudioRecorder:
-    def __init__(self, access_key):
-        self.cobra = pvcobra.create(access_key=access_key)
-        self.recorder = pvrecorder.PvRecorder(device_index=-1, frame_length=self.cobra.frame_length)
-        self.rate = self.recorder.sample_rate
+    def __init__(self, access_key, capture=None, pre_roll=PRE_ROLL_SECONDS, save_recordings=SAVE_RECORDINGS,
+                 adaptive_endpointing=ADAPTIVE_ENDPOINTING, cobra=None):
+        self.cobra = cobra or pvcobra.create(access_key=access_key)
+        if capture is None:
+            capture = AudioCapture(frame_length=self.cobra.frame_length)
+            capture.start()
+        self.capture = capture
+        self.rate = capture.sample_rate
         self.channels = 1
         self.sample_width = 2  # 16-bit audio
+        self.pre_roll_frames = int(pre_roll * self.rate / self.cobra.frame_length)
+        self.save_recordings = save_recordings
+        # Shared across recordings so it keeps learning the speaker's pauses
+        self.endpointer = Endpointer(self.cobra.frame_length / self.rate, adaptive=adaptive_endpointing)
+
+    def record(self, silence_duration=0.5, wait_for_speech=False, timeout=2.0, reader=None, in_memory=False):
+        """Record until silence_duration of silence. Pass the reader of a previous consumer to
+        continue from exactly where it stopped reading (e.g. straight after the wake word).
 
-    def record(self, silence_duration=0.5, wait_for_speech=False, timeout=2.0):
+        Returns the path of the saved WAV file, or with in_memory=True a RecordedAudio that is
+        saved in the background (if save_recordings is set)."""
         print("Listening for follow-up..." if wait_for_speech else "Recording... Speak now.")
-        
-        self.recorder.start()
 
-        frames = []
+        if reader is None:
+            reader = self.capture.reader(self.cobra.frame_length)
+
+        frames = array('h')  # 2 bytes per sample
+        voice_probabilities = []  # One Cobra probability per recorded frame, used to trim silence
         voice_probability_threshold = 0.5
-        silent_frames = 0
-        max_silent_frames = int(silence_duration * self.rate / self.cobra.frame_length)
+        self.endpointer.reset(max_silence=silence_duration)
         speech_detected = not wait_for_speech
+        waited_frames = 0
         start_time = time.time()
         
-        try:
-            while True:
-                pcm = self.recorder.read()
-                voice_probability = self.cobra.process(pcm)
-                
-                if wait_for_speech and not speech_detected:
-                    if voice_probability >= voice_probability_threshold:
-                        speech_detected = True
-                        print("Speech detected, recording...")
-                    elif time.time() - start_time > timeout:
-                        print("No speech detected within timeout.")
-                        return None
-                    else:
-                        continue
-                
-                frames.extend(pcm)
-                
+        while True:
+            pcm = reader.read()
+            if pcm is None:
+                break  # Capture stopped
+            voice_probability = self.cobra.process(pcm)
+            
+            if wait_for_speech and not speech_detected:
                 if voice_probability >= voice_probability_threshold:
-                    silent_frames = 0
+                    speech_detected = True
+                    print("Speech detected, recording...")
+                    # The frames leading up to this one are still in the capture ring buffer
+                    for frame in reader.previous(min(self.pre_roll_frames, waited_frames)):
+                        frames.extend(frame)
+                        voice_probabilities.append(0.0)
+                elif time.time() - start_time > timeout:
+                    print("No speech detected within timeout.")
+                    return None
                 else:
-                    silent_frames += 1
-                
-                if silent_frames >= max_silent_frames and speech_detected:
-                    break
-                
-        finally:
-            self.recorder.stop()
+                    waited_frames += 1
+                    continue
+            
+            frames.extend(pcm)
+            voice_probabilities.append(voice_probability)
+            
+            if self.endpointer.update(voice_probability) and speech_detected:
+                break
 
         if not frames:
             print("No speech detected.")
             return None
 
-        # Save the recorded audio to a WAV file
-        os.makedirs("voice_recordings", exist_ok=True)
+        frames = self._trim_silence(frames, voice_probabilities, voice_probability_threshold)
+        audio = RecordedAudio(frames, self.rate, self.sample_width, self.channels)
+
         timestamp = datetime.now().strftime("%Y%m%d_%H%M%S%f")
         wav_filename = os.path.join("voice_recordings", f"recording_{timestamp}.wav")
-        
-        with wave.open(wav_filename, 'wb') as wf:
-            wf.setnchannels(self.channels)
-            wf.setsampwidth(self.sample_width)
-            wf.setframerate(self.rate)
-            wf.writeframes(struct.pack(f"{len(frames)}h", *frames))
+        if in_memory:
+            if self.save_recordings:
+                threading.Thread(target=audio.save, args=(wav_filename,), daemon=True).start()
+            print(f"Recorded {audio.duration:.2f}s of audio")
+            return audio
 
+        audio.save(wav_filename)
         print(f"Audio saved as {wav_filename}")
         return wav_filename
 
+    def _trim_silence(self, frames, voice_probabilities, threshold):
+        """Cut leading and trailing silence using the VAD probabilities, keeping a little padding."""
+        voiced = [i for i, probability in enumerate(voice_probabilities) if probability >= threshold]
+        if not voiced:
+            return frames
+
+        frame_length = self.cobra.frame_length
+        frames_per_second = self.rate / frame_length
+        leading_padding = max(int(TRIM_LEADING_PADDING * frames_per_second), self.pre_roll_frames)
+        first = max(voiced[0] - leading_padding, 0)
+        last = min(voiced[-1] + 1 + int(TRIM_TRAILING_PADDING * frames_per_second), len(voice_probabilities))
+
+        trimmed = frames[first * frame_length:last * frame_length]
+        removed_seconds = (len(frames) - len(trimmed)) / self.rate
+        if removed_seconds:
+            print(f"Trimmed {removed_seconds:.2f}s of silence from the recording")
+        return trimmed
+
     def __del__(self):
-        self.recorder.delete()
         self.cobra.delete()
 
 def test_audio_recorder():
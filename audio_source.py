@@ -0,0 +1,72 @@
+import time
+import wave
+from array import array
+import pvrecorder
+
+
+class MicrophoneSource:
+    """The default audio source: the system microphone through PvRecorder."""
+
+    def __init__(self, frame_length, device_index=-1):
+        self.recorder = pvrecorder.PvRecorder(device_index=device_index, frame_length=frame_length)
+        self.frame_length = frame_length
+        self.sample_rate = self.recorder.sample_rate
+
+    def start(self):
+        self.recorder.start()
+
+    def stop(self):
+        self.recorder.stop()
+
+    def read(self):
+        return self.recorder.read()
+
+    def delete(self):
+        self.recorder.delete()
+
+
+class WavFileSource:
+    """Replays a 16-bit mono WAV file as if it came from the microphone.
+
+    With realtime=True frames are paced at the file's sample rate; otherwise they are produced
+    as fast as they are read. trailing_silence seconds of silence are appended so endpointing
+    can finish after the end of the recording. read() returns None once the file is exhausted.
+    """
+
+    def __init__(self, path, frame_length, realtime=False, trailing_silence=3.0):
+        with wave.open(path, 'rb') as wf:
+            if wf.getnchannels() != 1 or wf.getsampwidth() != 2:
+                raise ValueError(f"{path} must be 16-bit mono")
+            self.sample_rate = wf.getframerate()
+            self.samples = array('h', wf.readframes(wf.getnframes()))
+        self.samples.extend([0] * int(trailing_silence * self.sample_rate))
+        self.path = path
+        self.frame_length = frame_length
+        self.realtime = realtime
+        self.position = 0
+        self.started_at = None
+
+    @property
+    def duration(self):
+        return len(self.samples) / self.sample_rate
+
+    def start(self):
+        self.started_at = time.perf_counter()
+
+    def stop(self):
+        pass
+
+    def read(self):
+        end = self.position + self.frame_length
+        if end > len(self.samples):
+            return None
+        if self.realtime:
+            delay = self.started_at + end / self.sample_rate - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+        frame = self.samples[self.position:end].tolist()
+        self.position = end
+        return frame
+
+    def delete(self):
+        pass
@@ -0,0 +1,186 @@
+import os
+import json
+import glob
+import time
+import argparse
+from dotenv import load_dotenv
+from audio_source import WavFileSource
+from audio_capture import AudioCapture
+from audio_recorder import AudioRecorder
+from wake_word_detector import WakeWordDetector, rms
+
+# A detection this long before the labelled end of the wake word counts as a false accept
+FALSE_ACCEPT_TOLERANCE = 0.5
+
+
+class StubPorcupine:
+    """Energy-based stand-in for Porcupine, for running the pipeline without an access key.
+
+    Fires at the end of the first burst of sound, after some silence, that is about as long
+    as a wake word. Far less accurate than Porcupine; only meant for exercising the pipeline.
+    """
+
+    def __init__(self, frame_length=512, sample_rate=16000, threshold=1000.0, min_burst=0.25, max_burst=1.2):
+        self.frame_length = frame_length
+        self.sample_rate = sample_rate
+        self.threshold = threshold
+        frames_per_second = sample_rate / frame_length
+        self.min_burst_frames = int(min_burst * frames_per_second)
+        self.max_burst_frames = int(max_burst * frames_per_second)
+        self.burst_frames = 0
+
+    def process(self, pcm):
+        if rms(pcm) >= self.threshold:
+            self.burst_frames += 1
+            return -1
+        burst_frames, self.burst_frames = self.burst_frames, 0
+        return 0 if self.min_burst_frames <= burst_frames <= self.max_burst_frames else -1
+
+    def delete(self):
+        pass
+
+
+class StubCobra:
+    """Energy-based stand-in for Cobra: maps the frame level linearly onto a voice probability."""
+
+    def __init__(self, frame_length=512, sample_rate=16000, noise_level=300.0, speech_level=1500.0):
+        self.frame_length = frame_length
+        self.sample_rate = sample_rate
+        self.noise_level = noise_level
+        self.speech_level = speech_level
+
+    def process(self, pcm):
+        probability = (rms(pcm) - self.noise_level) / (self.speech_level - self.noise_level)
+        return min(max(probability, 0.0), 1.0)
+
+    def delete(self):
+        pass
+
+
+class TimedEngine:
+    """Wraps a Porcupine/Cobra instance and records how long each process() call takes."""
+
+    def __init__(self, engine):
+        self.engine = engine
+        self.durations = []
+        self.last_result = None
+
+    def __getattr__(self, name):
+        return getattr(self.engine, name)
+
+    def process(self, pcm):
+        start = time.perf_counter()
+        self.last_result = self.engine.process(pcm)
+        self.durations.append(time.perf_counter() - start)
+        return self.last_result
+
+
+def percentile(values, fraction):
+    if not values:
+        return None
+    values = sorted(values)
+    return values[min(int(len(values) * fraction), len(values) - 1)]
+
+
+def create_engines(access_key, use_stubs=False):
+    if use_stubs or not access_key:
+        print("Using energy-based stubs instead of Porcupine and Cobra.")
+        return StubPorcupine(), StubCobra()
+    import pvporcupine
+    import pvcobra
+    return pvporcupine.create(access_key=access_key, keywords=["jarvis"]), pvcobra.create(access_key=access_key)
+
+
+def benchmark_pipeline(corpus_dir="benchmark_corpus", realtime=False, use_stubs=False):
+    """Replay a labelled corpus through the wake word detector and recorder and report latencies.
+
+    corpus_dir holds 16 kHz 16-bit mono WAV files and a labels.json mapping each file name to
+    {"wake_word_end": seconds or null, "speech_end": seconds}. Files with no wake word are
+    used to count false accepts.
+    """
+    load_dotenv()
+    access_key = os.getenv("PICOVOICE_ACCESS_KEY")
+    with open(os.path.join(corpus_dir, "labels.json")) as f:
+        labels = json.load(f)
+    paths = sorted(glob.glob(os.path.join(corpus_dir, "*.wav")))
+    if not paths:
+        print(f"No recordings found in {corpus_dir}")
+        return None
+
+    porcupine, cobra = create_engines(access_key, use_stubs)
+    porcupine, cobra = TimedEngine(porcupine), TimedEngine(cobra)
+    detector = recorder = None
+    wake_latencies, endpoint_latencies = [], []
+    false_accepts = misses = negatives = 0
+
+    for path in paths:
+        label = labels.get(os.path.basename(path), {})
+        source = WavFileSource(path, porcupine.frame_length, realtime=realtime)
+        # Large enough for the whole file, so replaying faster than real time never overruns the ring
+        capture = AudioCapture(frame_length=porcupine.frame_length, buffer_seconds=source.duration + 1, source=source)
+        if detector is None:
+            # Created once so the endpointer keeps learning across the corpus, like a real session
+            recorder = AudioRecorder(access_key, capture, save_recordings=False, cobra=cobra)
+            detector = WakeWordDetector(access_key, capture, recorder, porcupine=porcupine)
+        detector.capture = recorder.capture = capture
+
+        frame_seconds = porcupine.frame_length / source.sample_rate
+        porcupine_frames = len(porcupine.durations)
+        porcupine.last_result = None
+        reader = capture.reader()
+        capture.start()
+        detector.listen(reader=reader)
+        capture.stop()
+
+        detected = porcupine.last_result is not None and porcupine.last_result >= 0
+        detected_at = (len(porcupine.durations) - porcupine_frames) * frame_seconds
+        wake_word_end = label.get("wake_word_end")
+        if wake_word_end is None:
+            negatives += 1
+            false_accepts += detected
+            continue
+        if not detected:
+            misses += 1
+            continue
+        if detected_at < wake_word_end - FALSE_ACCEPT_TOLERANCE:
+            false_accepts += 1
+            continue
+        wake_latencies.append(detected_at - wake_word_end)
+        if label.get("speech_end") is not None:
+            endpoint_latencies.append(reader.position * frame_seconds - label["speech_end"])
+
+    results = {
+        "recordings": len(paths),
+        "wake_latency_p50": percentile(wake_latencies, 0.5),
+        "wake_latency_p95": percentile(wake_latencies, 0.95),
+        "endpoint_latency_p50": percentile(endpoint_latencies, 0.5),
+        "endpoint_latency_p95": percentile(endpoint_latencies, 0.95),
+        "false_accepts": false_accepts,
+        "negatives": negatives,
+        "misses": misses,
+        "porcupine_us_per_frame": percentile(porcupine.durations, 0.5) * 1e6 if porcupine.durations else None,
+        "cobra_us_per_frame": percentile(cobra.durations, 0.5) * 1e6 if cobra.durations else None,
+    }
+
+    def ms(value):
+        return "n/a" if value is None else f"{value * 1000:.0f} ms"
+
+    print(f"\n{len(paths)} recordings ({'real time' if realtime else 'as fast as possible'})")
+    print(f"  Wake latency:      p50 {ms(results['wake_latency_p50'])}, p95 {ms(results['wake_latency_p95'])}")
+    print(f"  Endpoint latency:  p50 {ms(results['endpoint_latency_p50'])}, p95 {ms(results['endpoint_latency_p95'])}")
+    print(f"  False accepts:     {false_accepts} ({negatives} recordings without the wake word)")
+    print(f"  Missed wake words: {misses}")
+    for name, durations in (("Porcupine", porcupine.durations), ("Cobra", cobra.durations)):
+        if durations:
+            print(f"  {name} CPU/frame: p50 {percentile(durations, 0.5) * 1e6:.0f} us, "
+                  f"p95 {percentile(durations, 0.95) * 1e6:.0f} us over {len(durations)} frames")
+    return results
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark the wake word and recording pipeline on recorded audio.")
+    parser.add_argument("corpus_dir", nargs="?", default="benchmark_corpus")
+    parser.add_argument("--realtime", action="store_true", help="Replay at real-time speed instead of as fast as possible")
+    parser.add_argument("--stubs", action="store_true", help="Use energy-based stubs instead of Porcupine and Cobra")
+    args = parser.parse_args()
+    benchmark_pipeline(args.corpus_dir, realtime=args.realtime, use_stubs=args.stubs)
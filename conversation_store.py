@@ -0,0 +1,166 @@
+import os
+import json
+import time
+import pickle
+import sqlite3
+import tempfile
+import threading
+from collections import deque, namedtuple
+
+StoredMessage = namedtuple("StoredMessage", ["id", "message", "token_count"])
+
+
+class ConversationStore:
+    """Append-only conversation history backed by SQLite.
+
+    Only the most recent `window_size` messages are kept in memory. Each turn
+    appends just its new messages in a single transaction, so a crash mid-write
+    leaves the previous history intact and concurrent writers cannot interleave.
+    Each message's token count is stored next to it so it only has to be computed once.
+    """
+
+    def __init__(self, db_path="conversation_history.db", window_size=200, encode=json.dumps, decode=json.loads):
+        self.db_path = db_path
+        self.window_size = window_size
+        self.encode = encode
+        self.decode = decode
+        self._lock = threading.Lock()
+
+        # Autocommit mode; writes are grouped with explicit transactions below
+        self.conn = sqlite3.connect(db_path, check_same_thread=False, isolation_level=None)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.execute(
+            """CREATE TABLE IF NOT EXISTS messages (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                role TEXT NOT NULL,
+                payload TEXT NOT NULL,
+                created_at REAL NOT NULL,
+                token_count INTEGER
+            )"""
+        )
+        columns = [row[1] for row in self.conn.execute("PRAGMA table_info(messages)")]
+        if "token_count" not in columns:
+            self.conn.execute("ALTER TABLE messages ADD COLUMN token_count INTEGER")
+
+        rows = self.conn.execute(
+            "SELECT id, payload, token_count FROM messages ORDER BY id DESC LIMIT ?", (window_size,)
+        ).fetchall()
+        self._recent = deque(
+            (StoredMessage(row_id, self.decode(payload), token_count) for row_id, payload, token_count in reversed(rows)),
+            maxlen=window_size
+        )
+
+    def __len__(self):
+        return self.conn.execute("SELECT COUNT(*) FROM messages").fetchone()[0]
+
+    def recent(self, limit=None):
+        """Return up to `limit` of the most recent messages, oldest first, without touching disk."""
+        return [entry.message for entry in self.recent_entries(limit)]
+
+    def recent_entries(self, limit=None):
+        """Like recent(), but returns StoredMessage entries carrying the id and cached token count."""
+        with self._lock:
+            entries = list(self._recent)
+        return entries if limit is None else entries[-limit:]
+
+    def append(self, messages, roles, token_counts=None):
+        """Atomically append messages (with their roles and optional token counts) to the store."""
+        if not messages:
+            return
+        if token_counts is None:
+            token_counts = [None] * len(messages)
+        now = time.time()
+        rows = [(role, self.encode(message), now, tokens) for message, role, tokens in zip(messages, roles, token_counts)]
+        with self._lock:
+            self.conn.execute("BEGIN IMMEDIATE")
+            try:
+                row_ids = [
+                    self.conn.execute(
+                        "INSERT INTO messages (role, payload, created_at, token_count) VALUES (?, ?, ?, ?)", row
+                    ).lastrowid
+                    for row in rows
+                ]
+                self.conn.execute("COMMIT")
+            except Exception:
+                self.conn.execute("ROLLBACK")
+                raise
+            self._recent.extend(
+                StoredMessage(row_id, message, tokens) for row_id, message, tokens in zip(row_ids, messages, token_counts)
+            )
+
+    def set_token_count(self, message_id, token_count):
+        """Cache the token count of a message that was stored without one."""
+        with self._lock:
+            self.conn.execute("UPDATE messages SET token_count = ? WHERE id = ?", (token_count, message_id))
+            for index, entry in enumerate(self._recent):
+                if entry.id == message_id:
+                    self._recent[index] = entry._replace(token_count=token_count)
+                    break
+
+    def import_pickle(self, pickle_file, transform=None):
+        """One-time migration from the old pickled history file. The file is renamed once imported."""
+        if not os.path.exists(pickle_file) or len(self) > 0:
+            return 0
+        with open(pickle_file, 'rb') as f:
+            history = pickle.load(f)
+        if transform:
+            history = transform(history)
+        self.append(history, [message.role for message in history])
+        os.replace(pickle_file, pickle_file + ".migrated")
+        print(f"Imported {len(history)} messages from {pickle_file}")
+        return len(history)
+
+    def close(self):
+        self.conn.close()
+
+
+def benchmark_conversation_store(sizes=(100, 10_000, 100_000), turns=20):
+    """Compare per-turn load/save cost of the store against rewriting a pickle file."""
+    def make_message(i):
+        return {"role": "user", "parts": [{"text": f"Message {i}: what's the weather like in Newcastle this afternoon? " * 4}]}
+
+    print(f"{'messages':>10} {'pickle load':>12} {'pickle save':>12} {'store open':>11} {'store load':>11} {'store save':>11}")
+    for size in sizes:
+        with tempfile.TemporaryDirectory() as tmp:
+            history = [make_message(i) for i in range(size)]
+
+            pickle_file = os.path.join(tmp, "history.pkl")
+            with open(pickle_file, 'wb') as f:
+                pickle.dump(history, f)
+            start = time.perf_counter()
+            for _ in range(turns):
+                with open(pickle_file, 'rb') as f:
+                    loaded = pickle.load(f)
+            pickle_load = (time.perf_counter() - start) / turns
+            start = time.perf_counter()
+            for _ in range(turns):
+                loaded.extend([make_message(size), make_message(size + 1)])
+                with open(pickle_file, 'wb') as f:
+                    pickle.dump(loaded, f)
+            pickle_save = (time.perf_counter() - start) / turns
+
+            db_path = os.path.join(tmp, "history.db")
+            store = ConversationStore(db_path)
+            store.append(history, ["user"] * size)
+            store.close()
+
+            start = time.perf_counter()
+            store = ConversationStore(db_path)
+            store_open = time.perf_counter() - start
+            start = time.perf_counter()
+            for _ in range(turns):
+                store.recent()
+            store_load = (time.perf_counter() - start) / turns
+            start = time.perf_counter()
+            for _ in range(turns):
+                store.append([make_message(size), make_message(size + 1)], ["user", "model"])
+            store_save = (time.perf_counter() - start) / turns
+            store.close()
+
+        print(f"{size:>10} {pickle_load * 1000:>10.2f}ms {pickle_save * 1000:>10.2f}ms "
+              f"{store_open * 1000:>9.2f}ms {store_load * 1000:>9.2f}ms {store_save * 1000:>9.2f}ms")
+
+
+if __name__ == "__main__":
+    benchmark_conversation_store()
@@ -0,0 +1,172 @@
+import os
+import sys
+import glob
+import wave
+from array import array
+from collections import deque
+
+# Hysteresis on the smoothed voice probability: speech starts above ON and only ends below OFF
+SPEECH_ON_THRESHOLD = 0.6
+SPEECH_OFF_THRESHOLD = 0.35
+# Below this the end of speech is considered confident enough to commit early
+CONFIDENT_SILENCE_THRESHOLD = 0.1
+SMOOTHING = 0.4  # Weight of the newest frame in the moving average
+MIN_SILENCE_SECONDS = 0.35  # Never end on a pause shorter than this
+PAUSE_QUANTILE = 0.9  # End once the silence is longer than this share of the speaker's pauses...
+PAUSE_MARGIN = 1.3  # ...times this margin
+MIN_PAUSES = 3  # Pauses observed before the adaptive timeout is trusted
+PAUSE_HISTORY = 50
+
+
+class Endpointer:
+    """Decides when the user has finished speaking, from per-frame VAD probabilities.
+
+    The probability is smoothed and run through hysteresis thresholds, and the pauses the
+    speaker makes mid-utterance are remembered across turns. Once enough pauses have been
+    seen, an utterance ends as soon as the silence is confidently longer than the speaker's
+    usual pauses, instead of always waiting for the full max_silence.
+
+    With adaptive=False it behaves like the old fixed rule: the utterance ends after
+    max_silence of consecutive frames with a raw probability below 0.5.
+    """
+
+    def __init__(self, frame_seconds, adaptive=True, speech_on=SPEECH_ON_THRESHOLD, speech_off=SPEECH_OFF_THRESHOLD,
+                 confident_silence=CONFIDENT_SILENCE_THRESHOLD, smoothing=SMOOTHING, min_silence=MIN_SILENCE_SECONDS,
+                 pause_quantile=PAUSE_QUANTILE, pause_margin=PAUSE_MARGIN, min_pauses=MIN_PAUSES):
+        self.frame_seconds = frame_seconds
+        self.adaptive = adaptive
+        self.speech_on = speech_on
+        self.speech_off = speech_off
+        self.confident_silence = confident_silence
+        self.smoothing = smoothing
+        self.min_silence = min_silence
+        self.pause_quantile = pause_quantile
+        self.pause_margin = pause_margin
+        self.min_pauses = min_pauses
+        self.pauses = deque(maxlen=PAUSE_HISTORY)  # Seconds; kept across utterances
+        self.reset()
+
+    def reset(self, max_silence=1.0):
+        """Start a new utterance that ends after at most max_silence seconds of silence."""
+        self.max_silence = max_silence
+        self.smoothed = 0.0
+        self.in_speech = False
+        self.heard_speech = False
+        self.silent_frames = 0
+
+    def pause_timeout(self):
+        """Silence (in seconds) after which the utterance is considered finished."""
+        if not self.adaptive or len(self.pauses) < self.min_pauses:
+            return self.max_silence
+        pauses = sorted(self.pauses)
+        typical = pauses[min(int(len(pauses) * self.pause_quantile), len(pauses) - 1)]
+        return min(max(typical * self.pause_margin, self.min_silence), self.max_silence)
+
+    def update(self, probability):
+        """Feed the VAD probability of the next frame. Returns True once the utterance has ended."""
+        if not self.adaptive:
+            if probability >= 0.5:
+                self.silent_frames = 0
+                self.heard_speech = True
+            else:
+                self.silent_frames += 1
+            return self.silent_frames * self.frame_seconds >= self.max_silence
+
+        self.smoothed += self.smoothing * (probability - self.smoothed)
+        if self.smoothed >= self.speech_on or (self.in_speech and self.smoothed >= self.speech_off):
+            if not self.in_speech and self.heard_speech and self.silent_frames:
+                self.pauses.append(self.silent_frames * self.frame_seconds)  # Speech resumed after a pause
+            self.in_speech = True
+            self.heard_speech = True
+            self.silent_frames = 0
+            return False
+
+        self.in_speech = False
+        self.silent_frames += 1
+        silence = self.silent_frames * self.frame_seconds
+        if silence >= self.max_silence:
+            return True
+        # Only commit early after some speech, so a slow start is not cut off
+        return self.heard_speech and self.smoothed < self.confident_silence and silence >= self.pause_timeout()
+
+
+def vad_probabilities(wav_path, cobra):
+    """Run Cobra over a 16-bit mono WAV file and return one voice probability per frame."""
+    with wave.open(wav_path, 'rb') as wf:
+        if wf.getframerate() != cobra.sample_rate or wf.getnchannels() != 1 or wf.getsampwidth() != 2:
+            raise ValueError(f"{wav_path} must be 16-bit mono at {cobra.sample_rate} Hz")
+        samples = array('h', wf.readframes(wf.getnframes()))
+    frame_length = cobra.frame_length
+    return [cobra.process(samples[start:start + frame_length])
+            for start in range(0, len(samples) - frame_length + 1, frame_length)]
+
+
+def evaluate_endpointer(tracks, frame_seconds, max_silence=1.0, **config):
+    """Compare the adaptive endpointer with the fixed rule over a list of VAD probability tracks.
+
+    Each track is one recorded utterance. Trailing silence is padded so that every track can
+    reach the fixed timeout. The true end of speech is the last frame at or above 0.5; an
+    endpoint before it counts as a cut-off. Tracks are run in order with one endpointer, the
+    same way pause statistics build up over a session.
+    """
+    padding = [0.0] * (int(max_silence / frame_seconds) + 1)
+    fixed = Endpointer(frame_seconds, adaptive=False)
+    adaptive = Endpointer(frame_seconds, **config)
+    saved = []
+    cut_offs = 0
+
+    for track in tracks:
+        voiced = [index for index, probability in enumerate(track) if probability >= 0.5]
+        if not voiced:
+            continue
+        ends = []
+        for endpointer in (fixed, adaptive):
+            endpointer.reset(max_silence)
+            end = None
+            for index, probability in enumerate(track + padding):
+                if endpointer.update(probability):
+                    end = index
+                    break
+            ends.append(end if end is not None else len(track) + len(padding))
+        fixed_end, adaptive_end = ends
+        if adaptive_end < voiced[-1]:
+            cut_offs += 1
+        saved.append((fixed_end - adaptive_end) * frame_seconds)
+
+    if not saved:
+        print("No speech found in any fixture.")
+        return None
+    results = {
+        "utterances": len(saved),
+        "mean_latency_saved": sum(saved) / len(saved),
+        "max_latency_saved": max(saved),
+        "cut_off_rate": cut_offs / len(saved),
+    }
+    print(f"{results['utterances']} utterances, max_silence {max_silence:.1f}s: "
+          f"saved {results['mean_latency_saved'] * 1000:.0f} ms on average "
+          f"(up to {results['max_latency_saved'] * 1000:.0f} ms), "
+          f"cut-off rate {results['cut_off_rate']:.1%}")
+    return results
+
+
+def evaluate_fixtures(fixture_dir="endpointer_fixtures"):
+    """Offline evaluation on a directory of recorded utterances (e.g. copies of voice_recordings/)."""
+    import pvcobra
+    from dotenv import load_dotenv
+
+    load_dotenv()
+    cobra = pvcobra.create(access_key=os.getenv("PICOVOICE_ACCESS_KEY"))
+    try:
+        paths = sorted(glob.glob(os.path.join(fixture_dir, "*.wav")))
+        tracks = [vad_probabilities(path, cobra) for path in paths]
+        frame_seconds = cobra.frame_length / cobra.sample_rate
+    finally:
+        cobra.delete()
+
+    print(f"Evaluating on {len(paths)} fixtures from {fixture_dir}")
+    for max_silence in (1.0, 2.0):
+        evaluate_endpointer(tracks, frame_seconds, max_silence=max_silence)
+
+
+if __name__ == "__main__":
+    evaluate_fixtures(*sys.argv[1:])
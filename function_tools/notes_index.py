@@ -0,0 +1,124 @@
+import re
+import time
+import random
+from collections import defaultdict
+from datetime import datetime, timedelta
+
+try:
+    from rapidfuzz import fuzz
+except ImportError:
+    from fuzzywuzzy import fuzz
+
+MATCH_THRESHOLD = 70  # partial_ratio score a note needs to match, as in the original linear search
+# Share of the query's trigrams a note must contain to be scored at all
+MIN_TRIGRAM_OVERLAP = 0.3
+DATE_QUERY = re.compile(r"^\d{4}-\d{2}(-\d{2})?$")
+
+
+def trigrams(text):
+    text = " ".join(text.lower().split())
+    return {text[i:i + 3] for i in range(len(text) - 2)}
+
+
+class NotesIndex:
+    """In-memory search index over notes ({"date": iso timestamp, "content": text}).
+
+    Content queries go through a trigram inverted index that narrows the notes down to those
+    sharing enough trigrams with the query, and only those are fuzzy scored. Date queries
+    (YYYY-MM-DD or YYYY-MM) are exact lookups in a date index. Notes are added incrementally.
+    """
+
+    def __init__(self, notes=()):
+        self.notes = []
+        self.postings = defaultdict(set)  # trigram -> indexes of notes containing it
+        self.dates = defaultdict(list)  # YYYY-MM-DD -> note indexes
+        for note in notes:
+            self.add(note)
+
+    def __len__(self):
+        return len(self.notes)
+
+    def add(self, note):
+        index = len(self.notes)
+        self.notes.append(note)
+        for gram in trigrams(note["content"]):
+            self.postings[gram].add(index)
+        self.dates[note["date"][:10]].append(index)
+
+    def search(self, query, limit=5, threshold=MATCH_THRESHOLD):
+        """Notes matching the query, most recent first."""
+        query = query.strip()
+        if DATE_QUERY.match(query):
+            matches = [index for day, indexes in self.dates.items() if day.startswith(query) for index in indexes]
+        else:
+            matches = [index for index in self._candidates(query)
+                       if fuzz.partial_ratio(query, self.notes[index]["content"]) > threshold]
+        results = [self.notes[index] for index in matches]
+        results.sort(key=lambda note: note["date"], reverse=True)
+        return results[:limit]
+
+    def _candidates(self, query):
+        grams = trigrams(query)
+        if not grams:
+            return range(len(self.notes))  # Too short to index; score everything
+        required = max(1, int(len(grams) * MIN_TRIGRAM_OVERLAP))
+        # A note with `required` of the query's n trigrams must contain at least one of the n - required + 1
+        # rarest, so only those posting lists need to be read
+        postings = sorted((self.postings.get(gram, set()) for gram in grams), key=len)
+        candidates = set().union(*postings[:len(grams) - required + 1])
+        if required == 1:
+            return candidates
+        return [index for index in candidates
+                if sum(index in posting for posting in postings) >= required]
+
+
+def linear_search(notes, query, limit=5):
+    """The original take_notes search, kept for benchmarking."""
+    results = [note for note in notes
+               if fuzz.partial_ratio(query, note["date"]) > 70 or fuzz.partial_ratio(query, note["content"]) > 70]
+    results.sort(key=lambda note: note["date"], reverse=True)
+    return results[:limit]
+
+
+def benchmark_notes_index(sizes=(100, 10_000, 100_000), queries=10):
+    """Query latency of the index against the original linear fuzzy scan."""
+    words = ("buy milk eggs bread call mum dentist appointment tuesday meeting with sarah about the project "
+             "budget pick up dry cleaning book flights to lisbon renew passport car service water the plants "
+             "birthday present for tom gym membership cancel netflix fix the leaking tap").split()
+    random.seed(0)
+    # Pad the vocabulary out with made-up words so notes aren't all near-duplicates of each other
+    letters = "etaoinshrdlcumwfgypbvk"
+    words += ["".join(random.choices(letters, k=random.randint(3, 9))) for _ in range(5000)]
+    start_date = datetime(2023, 1, 1)
+
+    def make_note(i):
+        date = start_date + timedelta(minutes=37 * i)
+        return {"date": date.isoformat(), "content": " ".join(random.choices(words, k=random.randint(5, 25)))}
+
+    print(f"{'notes':>8} {'build':>9} {'linear text':>12} {'index text':>11} {'linear date':>12} {'index date':>11}")
+    for size in sizes:
+        notes = [make_note(i) for i in range(size)]
+        text_queries = [" ".join(random.choices(words, k=2)) for _ in range(queries)]
+        date_queries = [notes[random.randrange(size)]["date"][:10] for _ in range(queries)]
+
+        start = time.perf_counter()
+        index = NotesIndex(notes)
+        build = time.perf_counter() - start
+
+        timings = []
+        for search in (lambda q: linear_search(notes, q), index.search):
+            for query_set in (text_queries, date_queries):
+                # The linear scan is slow enough at 100k that a couple of queries is plenty
+                sample = query_set if search is index.search or size <= 10_000 else query_set[:2]
+                start = time.perf_counter()
+                for query in sample:
+                    search(query)
+                timings.append((time.perf_counter() - start) / len(sample))
+        linear_text, linear_date, index_text, index_date = timings
+
+        print(f"{size:>8} {build * 1000:>7.1f}ms {linear_text * 1000:>10.2f}ms {index_text * 1000:>9.2f}ms "
+              f"{linear_date * 1000:>10.2f}ms {index_date * 1000:>9.2f}ms")
+
+
+if __name__ == "__main__":
+    benchmark_notes_index()
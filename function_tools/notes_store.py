@@ -0,0 +1,171 @@
+import os
+import json
+import time
+import tempfile
+import threading
+
+# Rewrite the log in the background after this many appends
+COMPACT_EVERY = 1000
+
+
+class NotesLog:
+    """Append-only notes storage: one JSON object per line.
+
+    Adding a note writes and fsyncs just that line. A write torn by a crash leaves at most
+    one partial last line, which is cut off the next time the log is opened; other lines
+    that fail to parse are skipped. compact() rewrites the log without them, into a
+    temporary file that atomically replaces the log, while appends carry on.
+    """
+
+    def __init__(self, path="user_notes.jsonl"):
+        self.path = path
+        self._lock = threading.Lock()
+        self.appends_since_compaction = 0
+        self._compacting = False
+        self._repair_tail()
+        # Modification time after our own last write; anything else means the file was changed elsewhere
+        self.last_write_mtime = os.path.getmtime(path)
+
+    def load(self):
+        """All notes in the log, oldest first."""
+        with open(self.path, "rb") as f:
+            return self._parse(f.read())
+
+    def append(self, note):
+        line = (json.dumps(note) + "\n").encode("utf-8")
+        with self._lock:
+            with open(self.path, "ab") as f:
+                f.write(line)
+                f.flush()
+                os.fsync(f.fileno())
+            self.last_write_mtime = os.path.getmtime(self.path)
+            self.appends_since_compaction += 1
+            compact = self.appends_since_compaction >= COMPACT_EVERY and not self._compacting
+            if compact:
+                self._compacting = True
+        if compact:
+            threading.Thread(target=self.compact, daemon=True).start()
+
+    def compact(self):
+        """Rewrite the log with only valid lines. Notes appended meanwhile are carried over."""
+        try:
+            with self._lock:
+                snapshot_size = os.path.getsize(self.path)
+            with open(self.path, "rb") as f:
+                notes = self._parse(f.read(snapshot_size))
+
+            directory = os.path.dirname(os.path.abspath(self.path))
+            fd, temp_path = tempfile.mkstemp(dir=directory, suffix=".tmp")
+            try:
+                with os.fdopen(fd, "wb") as f:
+                    f.writelines((json.dumps(note) + "\n").encode("utf-8") for note in notes)
+                    with self._lock:
+                        # Anything appended since the snapshot is already a complete, fsynced line
+                        with open(self.path, "rb") as log:
+                            log.seek(snapshot_size)
+                            f.write(log.read())
+                        f.flush()
+                        os.fsync(f.fileno())
+                        os.replace(temp_path, self.path)
+                        self.last_write_mtime = os.path.getmtime(self.path)
+                        self.appends_since_compaction = 0
+            except BaseException:
+                if os.path.exists(temp_path):
+                    os.remove(temp_path)
+                raise
+        finally:
+            self._compacting = False
+
+    def import_json(self, json_file):
+        """One-time migration from the old user_notes.json. The file is renamed once imported."""
+        if not os.path.exists(json_file) or os.path.getsize(self.path) > 0:
+            return 0
+        with open(json_file, "r") as f:
+            text = f.read()
+        # The old writer never truncated, so there may be leftovers after the array
+        notes, _ = json.JSONDecoder().raw_decode(text.lstrip()) if text.strip() else ([], 0)
+        with self._lock:
+            with open(self.path, "ab") as f:
+                f.writelines((json.dumps(note) + "\n").encode("utf-8") for note in notes)
+                f.flush()
+                os.fsync(f.fileno())
+            self.last_write_mtime = os.path.getmtime(self.path)
+        os.replace(json_file, json_file + ".migrated")
+        print(f"Imported {len(notes)} notes from {json_file}")
+        return len(notes)
+
+    def _repair_tail(self):
+        """Create the log if needed and cut off a partial last line left by a crash."""
+        with open(self.path, "ab+") as f:
+            size = f.seek(0, os.SEEK_END)
+            if size == 0:
+                return
+            f.seek(max(size - 1, 0))
+            if f.read(1) == b"\n":
+                return
+            # Find the end of the last complete line
+            position = size
+            while position > 0:
+                step = min(4096, position)
+                f.seek(position - step)
+                chunk = f.read(step)
+                newline = chunk.rfind(b"\n")
+                if newline >= 0:
+                    position = position - step + newline + 1
+                    break
+                position -= step
+            f.truncate(position)
+            print(f"Removed a partial note ({size - position} bytes) from the end of {self.path}")
+
+    @staticmethod
+    def _parse(data):
+        notes = []
+        for line in data.splitlines():
+            if not line.strip():
+                continue
+            try:
+                notes.append(json.loads(line))
+            except json.JSONDecodeError:
+                print(f"Skipping unreadable note: {line[:80]!r}")
+        return notes
+
+
+def benchmark_notes_log(sizes=(100, 10_000, 100_000), writes=50):
+    """Per-note write cost of the append-only log against rewriting the whole JSON array."""
+    def make_note(i):
+        return {"date": f"2024-09-16T12:00:{i % 60:02d}", "content": f"Note {i}: remember to pick up the dry cleaning"}
+
+    print(f"{'notes':>8} {'json rewrite':>13} {'log append':>11} {'compaction':>11}")
+    for size in sizes:
+        with tempfile.TemporaryDirectory() as tmp:
+            notes = [make_note(i) for i in range(size)]
+
+            json_file = os.path.join(tmp, "user_notes.json")
+            with open(json_file, "w") as f:
+                json.dump(notes, f, indent=2)
+            start = time.perf_counter()
+            for i in range(writes):
+                with open(json_file, "r+") as f:
+                    data = json.load(f)
+                    data.append(make_note(size + i))
+                    f.seek(0)
+                    json.dump(data, f, indent=2)
+            json_write = (time.perf_counter() - start) / writes
+
+            log = NotesLog(os.path.join(tmp, "user_notes.jsonl"))
+            with open(log.path, "w") as f:
+                f.writelines(json.dumps(note) + "\n" for note in notes)
+            start = time.perf_counter()
+            for i in range(writes):
+                log.append(make_note(size + i))
+            log_write = (time.perf_counter() - start) / writes
+
+            start = time.perf_counter()
+            log.compact()
+            compaction = time.perf_counter() - start
+
+        print(f"{size:>8} {json_write * 1000:>11.2f}ms {log_write * 1000:>9.2f}ms {compaction * 1000:>9.1f}ms")
+
+
+if __name__ == "__main__":
+    benchmark_notes_log()
@@ -0,0 +1,122 @@
+import os
+import json
+import time
+import sqlite3
+import threading
+from datetime import datetime
+
+COLUMNS = ("id", "name", "created_at", "reminder_at")
+
+
+class ReminderStore:
+    """Reminders in SQLite, indexed on reminder_at and created_at.
+
+    Every insert and delete is its own transaction, so the reminder tool and the scheduler
+    can write concurrently without losing each other's changes. Queries only read the rows
+    in the requested range.
+    """
+
+    def __init__(self, db_path="reminders.db"):
+        self.db_path = db_path
+        self._lock = threading.Lock()
+        self.conn = sqlite3.connect(db_path, check_same_thread=False, isolation_level=None)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute(
+            """CREATE TABLE IF NOT EXISTS reminders (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                name TEXT NOT NULL,
+                created_at REAL NOT NULL,
+                reminder_at REAL NOT NULL
+            )"""
+        )
+        self.conn.execute("CREATE INDEX IF NOT EXISTS reminders_reminder_at ON reminders (reminder_at)")
+        self.conn.execute("CREATE INDEX IF NOT EXISTS reminders_created_at ON reminders (created_at)")
+
+    def __len__(self):
+        return self.conn.execute("SELECT COUNT(*) FROM reminders").fetchone()[0]
+
+    def add(self, name, reminder_at, created_at=None):
+        """Insert a reminder and return it as a dict with its new id."""
+        created_at = time.time() if created_at is None else created_at
+        with self._lock:
+            row_id = self.conn.execute(
+                "INSERT INTO reminders (name, created_at, reminder_at) VALUES (?, ?, ?)", (name, created_at, reminder_at)
+            ).lastrowid
+        return {"id": row_id, "name": name, "created_at": created_at, "reminder_at": reminder_at}
+
+    def delete(self, reminder_ids):
+        """Delete reminders by id in one transaction. Returns how many were deleted."""
+        with self._lock:
+            self.conn.execute("BEGIN IMMEDIATE")
+            try:
+                deleted = sum(
+                    self.conn.execute("DELETE FROM reminders WHERE id = ?", (reminder_id,)).rowcount
+                    for reminder_id in reminder_ids
+                )
+                self.conn.execute("COMMIT")
+            except Exception:
+                self.conn.execute("ROLLBACK")
+                raise
+        return deleted
+
+    def upcoming(self, after, start=None, end=None, limit=None):
+        """Reminders due after `after` (and within [start, end]), soonest first."""
+        where, params = self._range("reminder_at > ?", [after], start, end)
+        return self._query(f"WHERE {where} ORDER BY reminder_at", params, limit)
+
+    def recent(self, start=None, end=None, limit=None):
+        """Reminders due within [start, end], most recently created first."""
+        where, params = self._range("1", [], start, end)
+        return self._query(f"WHERE {where} ORDER BY created_at DESC", params, limit)
+
+    def all(self):
+        """Every stored reminder, soonest first."""
+        return self._query("ORDER BY reminder_at", [], None)
+
+    def import_json(self, json_file):
+        """One-time migration from the old reminders.json. The file is renamed once imported."""
+        if not os.path.exists(json_file) or len(self) > 0:
+            return 0
+        try:
+            with open(json_file, "r") as f:
+                reminders = json.load(f)
+        except json.JSONDecodeError:
+            reminders = []
+        rows = []
+        for reminder in reminders:
+            reminder_at = reminder["reminder_at"]
+            if isinstance(reminder_at, str):
+                reminder_at = datetime.strptime(reminder_at, "%Y-%m-%d %H:%M:%S").timestamp()
+            rows.append((reminder["name"], reminder.get("created_at", time.time()), reminder_at))
+        with self._lock:
+            self.conn.execute("BEGIN IMMEDIATE")
+            try:
+                self.conn.executemany("INSERT INTO reminders (name, created_at, reminder_at) VALUES (?, ?, ?)", rows)
+                self.conn.execute("COMMIT")
+            except Exception:
+                self.conn.execute("ROLLBACK")
+                raise
+        os.replace(json_file, json_file + ".migrated")
+        print(f"Imported {len(rows)} reminders from {json_file}")
+        return len(rows)
+
+    def close(self):
+        self.conn.close()
+
+    @staticmethod
+    def _range(where, params, start, end):
+        if start is not None:
+            where += " AND reminder_at >= ?"
+            params.append(start)
+        if end is not None:
+            where += " AND reminder_at <= ?"
+            params.append(end)
+        return where, params
+
+    def _query(self, clause, params, limit):
+        if limit is not None:
+            clause += " LIMIT ?"
+            params = params + [limit]
+        with self._lock:
+            rows = self.conn.execute(f"SELECT {', '.join(COLUMNS)} FROM reminders {clause}", params).fetchall()
+        return [dict(zip(COLUMNS, row)) for row in rows]
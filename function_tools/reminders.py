@@ -1,74 +1,73 @@
-import json
+import threading
 from datetime import datetime
+from function_tools.reminder_store import ReminderStore
+
+# Called with each new reminder after it is saved, e.g. to wake the reminder scheduler
+reminder_listeners = []
+# Called with the id of each reminder the user deletes
+reminder_removal_listeners = []
+
+_store = None
+_store_lock = threading.Lock()
+
+def get_store() -> ReminderStore:
+    """The shared reminder store, created (and migrated from reminders.json) on first use."""
+    global _store
+    with _store_lock:
+        if _store is None:
+            _store = ReminderStore("reminders.db")
+            _store.import_json("reminders.json")
+        return _store
+
+def _format(reminder: dict) -> dict:
+    return {
+        **reminder,
+        "created_at": datetime.fromtimestamp(reminder["created_at"]).strftime("%Y-%m-%d %H:%M:%S"),
+        "reminder_at": datetime.fromtimestamp(reminder["reminder_at"]).strftime("%Y-%m-%d %H:%M:%S"),
+    }
 
 def set_reminder(name: str, timestamp: str) -> str:
     """Set a reminder with the given name and timestamp. Timestamp needs to be provided in the format YYYY-MM-DD HH:MM:SS"""
     try:
         reminder_datetime = datetime.strptime(timestamp, "%Y-%m-%d %H:%M:%S")
-        reminder = {
-            "name": name,
-            "created_at": datetime.now().timestamp(),
-            "reminder_at": reminder_datetime.timestamp()
-        }
-        
-        try:
-            with open("reminders.json", "r") as f:
-                reminders = json.load(f)
-        except (FileNotFoundError, json.JSONDecodeError):
-            reminders = []
-        
-        reminders.append(reminder)
-        
-        with open("reminders.json", "w") as f:
-            json.dump(reminders, f)
-        
+        reminder = get_store().add(name, reminder_datetime.timestamp(), created_at=datetime.now().timestamp())
+
+        for listener in reminder_listeners:
+            listener(reminder)
+
         return f"Set reminder '{name}' for {timestamp}"
     except ValueError:
         raise ValueError("Invalid timestamp format. Please use YYYY-MM-DD HH:MM:SS")
 
 def get_reminders(mode: str = 'upcoming', start_date: str = None, end_date: str = None, limit: int = 10) -> list:
     """Get a list of reminders based on specified criteria."""
-    try:
-        with open("reminders.json", "r") as f:
-            reminders = json.load(f)
-    except (FileNotFoundError, json.JSONDecodeError):
-        reminders = []
-    
-    current_time = datetime.now().timestamp()
-    
-    if start_date:
-        start_timestamp = datetime.strptime(start_date, "%Y-%m-%d").timestamp()
-    if end_date:
-        end_timestamp = datetime.strptime(end_date, "%Y-%m-%d").timestamp()
-    
+    start_timestamp = datetime.strptime(start_date, "%Y-%m-%d").timestamp() if start_date else None
+    end_timestamp = datetime.strptime(end_date, "%Y-%m-%d").timestamp() if end_date else None
+
     if mode == 'upcoming':
-        filtered_reminders = [r for r in reminders if r['reminder_at'] > current_time]
-        sorted_reminders = sorted(filtered_reminders, key=lambda x: x['reminder_at'])
+        reminders = get_store().upcoming(datetime.now().timestamp(), start_timestamp, end_timestamp, limit)
     elif mode == 'recent':
-        sorted_reminders = sorted(reminders, key=lambda x: x['created_at'], reverse=True)
+        reminders = get_store().recent(start_timestamp, end_timestamp, limit)
     else:
         raise ValueError("Invalid mode. Use 'upcoming' or 'recent'.")
-    
-    if start_date and end_date:
-        sorted_reminders = [r for r in sorted_reminders if start_timestamp <= r['reminder_at'] <= end_timestamp]
-    elif start_date:
-        sorted_reminders = [r for r in sorted_reminders if r['reminder_at'] >= start_timestamp]
-    elif end_date:
-        sorted_reminders = [r for r in sorted_reminders if r['reminder_at'] <= end_timestamp]
-    
-    # Convert timestamps to strings before returning
-    for reminder in sorted_reminders:
-        reminder['created_at'] = datetime.fromtimestamp(reminder['created_at']).strftime("%Y-%m-%d %H:%M:%S")
-        reminder['reminder_at'] = datetime.fromtimestamp(reminder['reminder_at']).strftime("%Y-%m-%d %H:%M:%S")
-    
-    return sorted_reminders[:limit]
+
+    # Return timestamps as strings
+    return [_format(reminder) for reminder in reminders]
+
+def delete_reminder(reminder_id: int) -> str:
+    """Delete the reminder with the given id (as returned by get_reminders)."""
+    if not get_store().delete([reminder_id]):
+        return f"No reminder with id {reminder_id}"
+
+    for listener in reminder_removal_listeners:
+        listener(reminder_id)
+
+    return f"Deleted reminder {reminder_id}"
 
 def get_reminders_unix() -> list:
     """Get all reminders with Unix timestamps for internal checking."""
-    try:
-        with open("reminders.json", "r") as f:
-            reminders = json.load(f)
-    except (FileNotFoundError, json.JSONDecodeError):
-        reminders = []
-    
-    return reminders
\ No newline at end of file
+    return get_store().all()
+
+def remove_reminders(fired: list) -> None:
+    """Remove reminders that have been triggered."""
+    get_store().delete([reminder["id"] for reminder in fired])
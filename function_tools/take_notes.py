@@ -1,15 +1,35 @@
-import json
 import os
+import threading
 from datetime import datetime
-from fuzzywuzzy import fuzz
+from function_tools.notes_index import NotesIndex
+from function_tools.notes_store import NotesLog
+
+_log = None
+_log_lock = threading.Lock()
+# Search index over the notes log, rebuilt only if the file changes behind our back
+_index = None
+# Tool calls run concurrently; the index is loaded, added to and searched under this lock
+_index_lock = threading.Lock()
+
+def _get_log():
+    """The shared notes log, created (and migrated from user_notes.json) on first use."""
+    global _log
+    with _log_lock:
+        if _log is None:
+            _log = NotesLog("user_notes.jsonl")
+            _log.import_json("user_notes.json")
+        return _log
+
+def _load_index(log):
+    """The search index, (re)built from the log if needed. Call with _index_lock held."""
+    global _index
+    if _index is None or os.path.getmtime(log.path) != log.last_write_mtime:
+        _index = NotesIndex(log.load())
+        log.last_write_mtime = os.path.getmtime(log.path)
+    return _index
 
 def take_notes(notes: str = None, search: bool = False, query: str = None) -> str:
-    notes_file = "user_notes.json"
-    
-    # Ensure the JSON file exists
-    if not os.path.exists(notes_file):
-        with open(notes_file, "w") as f:
-            json.dump([], f)
+    log = _get_log()
     
     if not search:
         # Taking a new note
@@ -20,13 +40,11 @@ def take_notes(notes: str = None, search: bool = False, query: str = None) -> st
         new_note = {"date": timestamp, "content": notes}
         
         try:
-            with open(notes_file, "r+") as f:
-                data = json.load(f)
-                data.append(new_note)
-                f.seek(0)
-                json.dump(data, f, indent=2)
-        except json.JSONDecodeError:
-            return "Error: Failed to read notes file."
+            # Only the new note is written
+            with _index_lock:
+                log.append(new_note)
+                if _index is not None:
+                    _index.add(new_note)  # Keep the index in step instead of rebuilding it
         except IOError:
             return "Error: Failed to write to notes file."
         
@@ -37,25 +55,14 @@ def take_notes(notes: str = None, search: bool = False, query: str = None) -> st
         if not query:
             return "Error: No search query provided."
         
-        try:
-            with open(notes_file, "r") as f:
-                data = json.load(f)
-        except json.JSONDecodeError:
-            return "Error: Failed to read notes file."
-        except IOError:
-            return "Error: Failed to open notes file."
-        
-        results = []
-        for note in data:
-            date_match = fuzz.partial_ratio(query, note["date"])
-            content_match = fuzz.partial_ratio(query, note["content"])
-            
-            if date_match > 70 or content_match > 70:
-                results.append(note)
-        
-        # Sort results by date and limit to 5
-        results.sort(key=lambda x: x["date"], reverse=True)
-        results = results[:5]
+        with _index_lock:
+            try:
+                index = _load_index(log)
+            except IOError:
+                return "Error: Failed to open notes file."
+
+            # Most recent first, limited to 5
+            results = index.search(query, limit=5)
         
         if not results:
             return "No matching notes found."
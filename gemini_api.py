@@ -1,4 +1,5 @@
 import datetime
+import hashlib
 import os
 import json
 import pathlib
@@ -7,24 +8,70 @@ import google.generativeai as genai
 from google.generativeai.types import HarmCategory, HarmBlockThreshold
 from prompt import system_prompt
 from dotenv import load_dotenv
-import pickle
 import random
 import threading
+import queue
+from concurrent.futures import ThreadPoolExecutor
 from tools import Tools
+from conversation_store import ConversationStore
+from audio_encoder import encode_for_upload
+from retry_policy import RetryPolicy
+from text_normalizer import normalize, SentenceSplitter
 
 load_dotenv()
 
 MAX_RETRIES = 2
-RETRY_DELAY = 3
+REQUEST_DEADLINE = 20  # Seconds allowed for each send_message, including retries
+# gRPC timeout for a streamed reply. It covers the whole stream, so it has to allow for long
+# answers; REQUEST_DEADLINE still bounds the wait for the first chunk, retries included
+STREAM_TIMEOUT = 120
+SESSION_IDLE_TIMEOUT = 600  # Seconds of inactivity after which the chat session is rebuilt from the store
+MAX_CONCURRENT_TOOL_CALLS = 4  # Function calls from a single model turn run in parallel up to this limit
+
+# Local token estimates, used when caching per-message token counts
+CHARS_PER_TOKEN = 4
+AUDIO_TOKENS_PER_SECOND = 32
+WAV_BYTES_PER_SECOND = 32000  # 16 kHz, 16-bit mono as written by AudioRecorder
+
+# Stand-in text for audio parts from earlier turns, so old recordings are not re-uploaded with every request.
+# It carries the reply the model gave, since history selection keeps user messages but drops model ones
+AUDIO_PLACEHOLDER = "[Earlier voice message from the user, audio omitted (sha256:{digest}, {size} bytes)]"
+AUDIO_REPLY_PLACEHOLDER = ("[Earlier voice message from the user, audio omitted (sha256:{digest}, {size} bytes). "
+                           "You replied: \"{reply}\"]")
+REPLY_EXCERPT_CHARS = 400  # Longest reply kept with an audio placeholder
+
 
 class GeminiAPI:
-    def __init__(self):
+    def __init__(self, stream_responses=True):
         print("Initializing GeminiAPI...")
         genai.configure(api_key=os.environ["GEMINI_API_KEY"])
-        self.history_file = 'conversation_history.pkl'
+        self.history_file = 'conversation_history.pkl'  # Legacy pickle, imported into the store on first run
         self._load_system_prompt()
         self._create_model()
-        self.max_history_length = 13  # Set the maximum number of messages to keep
+        self.history_token_budget = 4000  # Maximum tokens of past messages sent with each request
+        self.compact_audio_history = True  # Replace audio from past turns with a short text reference
+        self.history_store = ConversationStore(
+            'conversation_history.db',
+            encode=lambda message: genai.protos.Content.to_json(message, indent=None),
+            decode=genai.protos.Content.from_json
+        )
+        self.history_store.import_pickle(self.history_file, transform=self._compact_history)
+        self.retry_policy = RetryPolicy(max_attempts=MAX_RETRIES + 1, deadline=REQUEST_DEADLINE, hedge=False)
+        self.tool_executor = ThreadPoolExecutor(max_workers=MAX_CONCURRENT_TOOL_CALLS, thread_name_prefix="tool-call")
+        self.audio_upload_format = "opus"  # "opus", "flac" or "wav"; see audio_encoder.UPLOAD_FORMATS
+        self.stream_responses = stream_responses  # Speak sentences as they stream in rather than after the full reply
+        self.last_turn_stats = {}
+
+        # Live chat session, reused across turns until it goes idle or outgrows the history budget
+        self.chat_session = None
+        self.session_idle_timeout = SESSION_IDLE_TIMEOUT
+        self._session_tokens = 0
+        self._last_turn_at = 0
+
+        # Finished turns are written to the store in the background, off the response path
+        self.persist_queue = queue.Queue()
+        self.persist_thread = threading.Thread(target=self._process_persist_queue, daemon=True)
+        self.persist_thread.start()
         print("GeminiAPI initialized.")
 
     def _load_system_prompt(self):
@@ -58,31 +105,106 @@ class GeminiAPI:
         )
         # print(self.model._tools.to_proto())
 
-    def process_audio(self, audio_file, tts_engine=None):
-        return self.generate_response(audio_file, input_type="audio", tts_engine=tts_engine)
-    
-    def process_text(self, text, tts_engine=None):
-        return self.generate_response(text, input_type="text", tts_engine=tts_engine)
+    @staticmethod
+    def _reply_to(history, index):
+        """The model's text reply to the user message at index, up to the next user message."""
+        texts = []
+        for message in history[index + 1:]:
+            if message.role != "model":
+                if 'function_response' in message.parts[0]:
+                    continue
+                break
+            texts.extend(part.text for part in message.parts if part.text)
+        reply = " ".join(" ".join(texts).split())
+        if len(reply) > REPLY_EXCERPT_CHARS:
+            reply = reply[:REPLY_EXCERPT_CHARS].rsplit(" ", 1)[0] + "..."
+        return reply
 
-    def generate_response(self, input_data, input_type="text", tts_engine=None):
-        # Load conversation history from file
-        if os.path.exists(self.history_file):
-            with open(self.history_file, 'rb') as f:
-                history = pickle.load(f)
-        else:
-            history = []
-
-        # Trim history while ensuring it starts with a user or model message
-        trimmed_history = []
-        for message in reversed(history):
-            if not trimmed_history or message.role == "user" or 'function_response' in message.parts[0]:
-                trimmed_history.insert(0, message)
-                if len(trimmed_history) >= self.max_history_length:
+    def _compact_history(self, history):
+        """Return history with inline audio parts replaced by a content-hash reference and the model's reply."""
+        if not self.compact_audio_history:
+            return history
+
+        compacted = []
+        bytes_removed = 0
+        for index, message in enumerate(history):
+            parts = []
+            changed = False
+            for part in message.parts:
+                if 'inline_data' in part and part.inline_data.mime_type.startswith('audio/'):
+                    data = part.inline_data.data
+                    bytes_removed += len(data)
+                    changed = True
+                    reply = self._reply_to(history, index)
+                    placeholder = AUDIO_REPLY_PLACEHOLDER if reply else AUDIO_PLACEHOLDER
+                    parts.append(genai.protos.Part(text=placeholder.format(
+                        digest=hashlib.sha256(data).hexdigest()[:16],
+                        size=len(data),
+                        reply=reply.replace('"', "'")
+                    )))
+                else:
+                    parts.append(part)
+            if changed:
+                message = genai.protos.Content(role=message.role, parts=parts)
+            compacted.append(message)
+
+        if bytes_removed:
+            print(f"Compacted history: removed {bytes_removed} bytes of audio")
+        return compacted
+
+    def _count_tokens(self, message):
+        """Estimate the prompt tokens a stored message will cost when replayed."""
+        tokens = 0
+        for part in message.parts:
+            if 'inline_data' in part:
+                seconds = len(part.inline_data.data) / WAV_BYTES_PER_SECOND
+                tokens += int(seconds * AUDIO_TOKENS_PER_SECOND)
+            elif 'function_response' in part or 'function_call' in part:
+                tokens += len(type(part).to_json(part, indent=None)) // CHARS_PER_TOKEN
+            else:
+                tokens += len(part.text) // CHARS_PER_TOKEN
+        return max(tokens, 1)
+
+    def _select_history(self, entries):
+        """Pick the newest messages that fit in the token budget.
+
+        Like the original count-based trim, the newest message is always a candidate and
+        older ones are kept only if they are user messages or function responses.
+        """
+        selected = []
+        used_tokens = 0
+        for entry in reversed(entries):
+            message = entry.message
+            if not selected or message.role == "user" or 'function_response' in message.parts[0]:
+                token_count = entry.token_count
+                if token_count is None:
+                    token_count = self._count_tokens(message)
+                    self.history_store.set_token_count(entry.id, token_count)
+                if used_tokens + token_count > self.history_token_budget:
                     break
+                selected.insert(0, (message, token_count))
+                used_tokens += token_count
 
         # Ensure the last turn is a user turn
-        if trimmed_history and trimmed_history[-1].role == "model":
-            trimmed_history.pop()
+        if selected and selected[-1][0].role == "model":
+            used_tokens -= selected.pop()[1]
+
+        print(f"Selected {len(selected)} history messages ({used_tokens} tokens of {self.history_token_budget})")
+        return [message for message, _ in selected], used_tokens
+
+    def _get_chat_session(self):
+        """Return the live chat session, rebuilding it from the store only when it has to be."""
+        if self.chat_session is not None:
+            if time.time() - self._last_turn_at > self.session_idle_timeout:
+                print("Chat session idle, rebuilding from history.")
+            elif self._session_tokens > self.history_token_budget:
+                print("Chat session over the history budget, re-windowing.")
+            else:
+                return self.chat_session
+
+        # Make sure every finished turn has reached the store before selecting from it
+        self.persist_queue.join()
+        trimmed_history, self._session_tokens = self._select_history(self.history_store.recent_entries())
 
         # Debugging output to check the trimmed history
         print("Trimmed History:")
@@ -90,15 +212,65 @@ class GeminiAPI:
             print(msg)
 
         # Start chat session with system prompt and trimmed history
-        chat_session = self.model.start_chat(history=trimmed_history)
+        return self.model.start_chat(history=trimmed_history)
+
+    def _send_message(self, chat_session, content):
+        """Send content through the retry policy. Returns (chat_session, response).
+
+        Retries and hedged requests run on a copy of the session so that a slow attempt still in
+        flight cannot interleave with them; whichever copy produced the response is returned.
+        """
+        base_history = list(chat_session.history)
+
+        def attempt(is_first, timeout):
+            session = chat_session if is_first else self.model.start_chat(history=base_history)
+            if self.stream_responses:
+                timeout = STREAM_TIMEOUT
+            response = session.send_message(content, stream=self.stream_responses, request_options={"timeout": timeout})
+            return session, response
+
+        # A streamed send_message returns with the first chunk, which has to arrive within the deadline
+        return self.retry_policy.call(attempt, bounded=self.stream_responses)
+
+    def _process_persist_queue(self):
+        while True:
+            messages, token_counts = self.persist_queue.get()
+            try:
+                self.history_store.append(messages, [message.role for message in messages], token_counts)
+            except Exception as e:
+                print(f"Error saving conversation history: {str(e)}")
+            self.persist_queue.task_done()
+
+    def process_audio(self, audio_file, tts_engine=None):
+        return self.generate_response(audio_file, input_type="audio", tts_engine=tts_engine)
+    
+    def process_text(self, text, tts_engine=None):
+        return self.generate_response(text, input_type="text", tts_engine=tts_engine)
+
+    def generate_response(self, input_data, input_type="text", tts_engine=None):
+        turn_start = time.time()
+        turn_stats = {"first_token_latency": None, "first_audio_latency": None, "total_tokens": None, "audio_bytes_saved": 0}
+        self.last_turn_stats = turn_stats
+
+        # Take the session out while the turn runs; if anything fails it is rebuilt on the next turn
+        chat_session = self._get_chat_session()
+        self.chat_session = None
+        history_start = len(chat_session.history)
 
         # Prepare input based on type
         if input_type == "audio":
+            # Either a path to a WAV file or an in-memory RecordedAudio from AudioRecorder
+            if hasattr(input_data, "to_wav_bytes"):
+                wav_bytes = input_data.to_wav_bytes()
+            else:
+                wav_bytes = pathlib.Path(input_data).read_bytes()
+            audio_data, mime_type = encode_for_upload(wav_bytes, self.audio_upload_format)
+            turn_stats["audio_bytes_saved"] = len(wav_bytes) - len(audio_data)
             content = [
                 "Current date and time: " + datetime.datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
                 {
-                    "mime_type": "audio/wav",
-                    "data": pathlib.Path(input_data).read_bytes()
+                    "mime_type": mime_type,
+                    "data": audio_data
                 },
             ]
         else:
@@ -106,68 +278,82 @@ class GeminiAPI:
 
         # Send message and process response
         try:
-            response = chat_session.send_message(content)
-            total_tokens = response.usage_metadata.total_token_count
+            chat_session, response = self._send_message(chat_session, content)
         except Exception as e:
             print(f"Error generating response: {str(e)}")
-            
-            for retry in range(MAX_RETRIES):
-                print(f"Retrying ({retry + 1}/{MAX_RETRIES})...")
-                time.sleep(RETRY_DELAY)
-                
-                try:
-                    response = chat_session.send_message(content)
-                    total_tokens = response.usage_metadata.total_token_count
-                    break  # Break out of the retry loop if successful
-                except Exception as e:
-                    print(f"Error generating response during retry {retry + 1}: {str(e)}")
-            else:  # Execute if the loop completes without breaking
-                print("Max retries reached.")
+            return []
 
-        print("_" * 100)
-        print(f"Total token count: {total_tokens}")
-        print("_" * 100)
-        
         chat_local_history = []
+        splitter = SentenceSplitter()
+
+        def on_playback_start():
+            if turn_stats["first_audio_latency"] is None:
+                turn_stats["first_audio_latency"] = time.time() - turn_start
+                print(f"First audio latency: {turn_stats['first_audio_latency']:.2f}s")
+
+        def speak_sentence(sentence):
+            cleaned_text = sentence.strip()
+            if not cleaned_text:
+                return
+            chat_local_history.append(cleaned_text)
+
+            # Queue the sentence for synthesis straight away; the TTS engine works through its queue in order
+            if tts_engine:
+                # Strip symbols, emojis and markdown that TTS would read out
+                cleaned_text = normalize(cleaned_text)
+                if cleaned_text:
+                    print(cleaned_text)
+                    tts_engine.speak_openai(cleaned_text, on_start=on_playback_start)
 
         def process_part(part):
             if part.text:
-                # Remove newlines, then strip whitespace
-                cleaned_text = part.text.replace('\n', '').strip()
-                if cleaned_text:
-                    chat_local_history.append(cleaned_text)
+                if turn_stats["first_token_latency"] is None:
+                    turn_stats["first_token_latency"] = time.time() - turn_start
+                    print(f"First token latency: {turn_stats['first_token_latency']:.2f}s")
+                for sentence in splitter.feed(part.text):
+                    speak_sentence(sentence)
                     
-                    # Send the text to the TTS engine in a separate thread
-                    if tts_engine:
-                        # Remove symbols that TTS would read out as full characters
-                        for symbol in ['*', '#', '@', '^', '~', '`', '|']:
-                            cleaned_text = cleaned_text.replace(symbol, '')
-                        
-                        # Remove emojis
-                        import re
-                        emoji_pattern = re.compile("["
-                            u"\U0001F600-\U0001F64F"  # emoticons
-                            u"\U0001F300-\U0001F5FF"  # symbols & pictographs
-                            u"\U0001F680-\U0001F6FF"  # transport & map symbols
-                            u"\U0001F1E0-\U0001F1FF"  # flags (iOS)
-                            u"\U00002702-\U000027B0"
-                            u"\U000024C2-\U0001F251"
-                            "]+", flags=re.UNICODE)
-                        cleaned_text = emoji_pattern.sub(r'', cleaned_text)
-                        
-                        # Remove extra whitespace
-                        cleaned_text = re.sub(r'\s+', ' ', cleaned_text).strip()
-                        
-                        print(cleaned_text)
-                        threading.Thread(target=tts_engine.speak_openai, args=(cleaned_text,)).start()
-                    
-            elif hasattr(part, 'function_call'):
-                fn = part.function_call
-                args_dict = dict(fn.args)
-                print(f"Function call: {fn.name} with arguments: {args_dict}")
-                result = Tools.call_function(fn.name, **args_dict)
-                print(f"Function output: {result}")
-                
+            elif 'function_call' in part:
+                function_calls.append(part.function_call)
+
+        def run_function_call(fn):
+            args_dict = dict(fn.args)
+            print(f"Function call: {fn.name} with arguments: {args_dict}")
+            result = Tools.call_function(fn.name, **args_dict)
+            print(f"Function output: {result}")
+            return result
+
+        def iter_parts(response):
+            if self.stream_responses:
+                # Parts arrive chunk by chunk; the response is fully resolved once the loop completes
+                for chunk in response:
+                    yield from chunk.parts
+            else:
+                yield from response.parts
+
+        while True:
+            function_calls = []
+            try:
+                for part in iter_parts(response):
+                    process_part(part)
+            except Exception as e:
+                # A stream can fail part way through; the session is rebuilt on the next turn
+                print(f"Error reading response stream: {str(e)}")
+                return chat_local_history
+            for sentence in splitter.flush():
+                speak_sentence(sentence)
+
+            if response.usage_metadata:
+                turn_stats["total_tokens"] = response.usage_metadata.total_token_count
+
+            # Independent calls run concurrently; map() hands results back in the original call order
+            tools_start = time.time()
+            results = list(self.tool_executor.map(run_function_call, function_calls))
+            if len(function_calls) > 1:
+                print(f"Ran {len(function_calls)} function calls in {time.time() - tools_start:.2f}s")
+
+            function_responses = []
+            for fn, result in zip(function_calls, results):
                 function_responses.append(genai.protos.Part(
                     function_response=genai.protos.FunctionResponse(
                         name=fn.name,
@@ -175,23 +361,38 @@ class GeminiAPI:
                     )
                 ))
 
-        while True:
-            function_responses = []
-            for part in response.parts:
-                process_part(part)
-
             if function_responses:
                 # Send all function responses back to the model
-                response = chat_session.send_message(
-                    genai.protos.Content(parts=function_responses)
-                )
+                try:
+                    chat_session, response = self._send_message(
+                        chat_session, genai.protos.Content(parts=function_responses)
+                    )
+                except Exception as e:
+                    print(f"Error generating response to function output: {str(e)}")
+                    return chat_local_history
             else:
                 # If no function calls were made, exit the loop
                 break
 
-        # Save updated history using chat_session.history
-        with open(self.history_file, 'wb') as f:
-            pickle.dump(chat_session.history, f)
+        print("_" * 100)
+        print(f"Total token count: {turn_stats['total_tokens']}")
+        print("_" * 100)
+
+        # Keep only this turn's messages, without the raw audio, both in the live session and the store
+        try:
+            history = chat_session.history
+        except Exception as e:
+            # Streamed replies stopped for safety or recitation only fail once the history is read
+            print(f"Error reading chat history: {str(e)}")
+            return chat_local_history
+        new_messages = self._compact_history(history[history_start:])
+        token_counts = [self._count_tokens(message) for message in new_messages]
+        chat_session.history = history[:history_start] + new_messages
+
+        self.chat_session = chat_session
+        self._session_tokens += sum(token_counts)
+        self._last_turn_at = time.time()
+        self.persist_queue.put((new_messages, token_counts))
 
         return chat_local_history
 
@@ -1,32 +1,39 @@
 import os
 from dotenv import load_dotenv
-from wake_word_detector import WakeWordDetector
+from wake_word_detector import WakeWordDetector, BargeInMonitor
 from gemini_api import GeminiAPI
 from tts_engine import TTSEngine
 from tools import Tools
-import time
-import threading
-import json
 from audio_recorder import AudioRecorder
-import pygame
-from datetime import datetime
-from function_tools.reminders import get_reminders_unix
+from audio_capture import AudioCapture
+from function_tools import reminders
+from function_tools.reminders import get_reminders_unix, remove_reminders
+from reminder_scheduler import ReminderScheduler
 
 class VoiceAssistant:
     def __init__(self, enable_follow_up=True):
         load_dotenv()
         self.access_key = os.getenv("PICOVOICE_ACCESS_KEY")
-        self.wake_word_detector = WakeWordDetector(self.access_key)
+        # One capture thread owns the microphone; the wake word engine and recorder read from it
+        self.capture = AudioCapture()
+        self.capture.start()
+        self.audio_recorder = AudioRecorder(self.access_key, self.capture)
+        self.wake_word_detector = WakeWordDetector(self.access_key, self.capture, self.audio_recorder)
         self.gemini_api = GeminiAPI()
         self.tts_engine = TTSEngine()
+        self.barge_in = BargeInMonitor(self.wake_word_detector, self.tts_engine)
         self.tools = Tools()
-        self.audio_recorder = AudioRecorder(self.access_key)
         self.enable_follow_up = enable_follow_up
+        # Reminders coming up soon have their speech rendered ahead of time
+        self.reminder_scheduler = ReminderScheduler(self._on_reminder_due, on_upcoming=self._prerender_reminder)
+        reminders.reminder_listeners.append(self.reminder_scheduler.add)
+        reminders.reminder_removal_listeners.append(self._on_reminder_deleted)
 
     def run(self):
         print("Voice Assistant is running. Say 'Jarvis' to activate.")
-        reminder_thread = threading.Thread(target=self._check_reminders, daemon=True)
-        reminder_thread.start()
+        # Sleeps until the next reminder is due; set_reminder wakes it if a sooner one is added
+        self.reminder_scheduler.load(get_reminders_unix())
+        self.reminder_scheduler.start()
         while True:
             # Wait for wake word
             audio_file = self.wake_word_detector.listen()
@@ -34,59 +41,36 @@ class VoiceAssistant:
                 self.process_interaction(audio_file)
 
     def process_interaction(self, audio_file):
-        response = self.gemini_api.process_audio(audio_file, tts_engine=self.tts_engine)
-        
-        if not self.enable_follow_up:
-            return  # Exit the method if follow-up is disabled
+        while audio_file:
+            # Keep listening for the wake word while the response is generated and spoken
+            self.barge_in.start()
+            response = self.gemini_api.process_audio(audio_file, tts_engine=self.tts_engine)
+            audio_file = self.barge_in.wait()
+            self.tts_engine.resume()
+            if audio_file:
+                continue  # The user interrupted with a new request
+
+            if not self.enable_follow_up:
+                return  # Exit the method if follow-up is disabled
 
-        while True:
-            # Wait for TTS to finish
-            while self.tts_engine.is_speaking:
-                time.sleep(3)
-            
-            # Wait for pygame mixer to become idle
-            while pygame.mixer.music.get_busy():
-                time.sleep(1.5)
-            
             # Listen for follow-up
-            follow_up_audio = self.audio_recorder.record(silence_duration=2.0, wait_for_speech=True, timeout=2.0)
-            if follow_up_audio:
-                response = self.gemini_api.process_audio(follow_up_audio, tts_engine=self.tts_engine)
-            else:
+            audio_file = self.audio_recorder.record(silence_duration=2.0, wait_for_speech=True, timeout=2.0, in_memory=True)
+            if not audio_file:
                 print("No follow-up detected. Returning to wake word detection.")
-                break  # Exit the loop and return to listening for the wake word
 
-    def _check_reminders(self):
-        while True:
-            reminders = get_reminders_unix()  # Get all reminders with Unix timestamps
-            current_time = time.time()
-            print(f"Current time: {datetime.fromtimestamp(current_time).strftime('%Y-%m-%d %H:%M:%S')}")
-            reminders_to_remove = []
-            for reminder in reminders:
-                print(f"Checking reminder: {reminder}")
-                reminder_time = reminder["reminder_at"]
-                if isinstance(reminder_time, str):
-                    # Convert string timestamp to Unix timestamp if necessary
-                    reminder_time = datetime.strptime(reminder_time, "%Y-%m-%d %H:%M:%S").timestamp()
-                print(f"Reminder time: {datetime.fromtimestamp(reminder_time).strftime('%Y-%m-%d %H:%M:%S')}")
-                if reminder_time <= current_time:
-                    print(f"Reminder triggered: {reminder}")
-                    response = self.gemini_api.generate_reminder_response(reminder)
-                    self.tts_engine.queue_reminder_response(response)
-                    reminders_to_remove.append(reminder)
-            
-            if reminders_to_remove:
-                print(f"Reminders to remove: {reminders_to_remove}")
-                # Remove triggered reminders
-                updated_reminders = [r for r in reminders if r not in reminders_to_remove]
-                # Save updated reminders
-                with open("reminders.json", "w") as f:
-                    json.dump(updated_reminders, f)
-                print(f"Updated reminders saved: {updated_reminders}")
-            else:
-                print("No reminders to remove")
-            
-            time.sleep(5)  # Check reminders every 5 seconds for debugging
+    def _prerender_reminder(self, reminder):
+        response = self.gemini_api.generate_reminder_response(reminder)
+        self.tts_engine.prerender_reminder(reminder["id"], response)
+
+    def _on_reminder_due(self, reminder):
+        print(f"Reminder triggered: {reminder}")
+        response = self.gemini_api.generate_reminder_response(reminder)
+        self.tts_engine.queue_reminder_response(response, reminder_id=reminder["id"])
+        remove_reminders([reminder])
+
+    def _on_reminder_deleted(self, reminder_id):
+        self.reminder_scheduler.cancel(reminder_id)
+        self.tts_engine.discard_prerendered(reminder_id)
 
     def test_audio_input(self, audio_file):
         # Send audio to Gemini API
@@ -0,0 +1,170 @@
+import os
+import json
+import time
+import heapq
+import tempfile
+import threading
+from datetime import datetime
+
+# Reminders due within this many seconds are handed to on_upcoming ahead of time (e.g. to pre-render speech)
+PRERENDER_HORIZON = 600
+
+DUE = "due"
+UPCOMING = "upcoming"
+
+
+def reminder_timestamp(reminder):
+    """The reminder's due time as a Unix timestamp (older entries stored it as a string)."""
+    reminder_at = reminder["reminder_at"]
+    if isinstance(reminder_at, str):
+        return datetime.strptime(reminder_at, "%Y-%m-%d %H:%M:%S").timestamp()
+    return reminder_at
+
+
+class ReminderScheduler:
+    """Fires reminders at their due time from an in-memory min-heap.
+
+    The scheduler thread sleeps until the earliest reminder is due, rather than polling.
+    add() wakes it early if the new reminder is due sooner than the one it is waiting for.
+    Due reminders are popped off the heap in O(log n) and passed to on_due(reminder).
+
+    If on_upcoming is given, it is called with each reminder `horizon` seconds before it is
+    due (or straight away if it is already closer than that). cancel() drops a reminder.
+    """
+
+    def __init__(self, on_due, on_upcoming=None, horizon=PRERENDER_HORIZON):
+        self.on_due = on_due
+        self.on_upcoming = on_upcoming
+        self.horizon = horizon
+        self.heap = []  # (time, sequence, DUE or UPCOMING, reminder)
+        self.sequence = 0  # Tie-breaker so reminders themselves are never compared
+        self.cancelled = set()  # Ids of reminders whose entries are still in the heap
+        self.condition = threading.Condition()
+        self.running = False
+        self.thread = None
+
+    def load(self, reminders):
+        """Replace the pending reminders in one O(n) heapify."""
+        with self.condition:
+            self.heap = []
+            self.cancelled.clear()
+            for reminder in reminders:
+                self.heap.extend(self._entries(reminder))
+            heapq.heapify(self.heap)
+            self.condition.notify()
+
+    def add(self, reminder):
+        with self.condition:
+            earliest = self.heap[0][0] if self.heap else None
+            for entry in self._entries(reminder):
+                heapq.heappush(self.heap, entry)
+            if earliest is None or self.heap[0][0] < earliest:
+                self.condition.notify()  # New earliest entry; the thread is waiting for a later one
+
+    def cancel(self, reminder_id):
+        """Stop a reminder from firing. Its heap entries are skipped when they come up."""
+        with self.condition:
+            self.cancelled.add(reminder_id)
+
+    def _entries(self, reminder):
+        due = reminder_timestamp(reminder)
+        entries = [(due, self.sequence, DUE, reminder)]
+        if self.on_upcoming:
+            entries.append((due - self.horizon, self.sequence + 1, UPCOMING, reminder))
+        self.sequence += 2
+        return entries
+
+    def next_due(self):
+        with self.condition:
+            return self.heap[0][0] if self.heap else None
+
+    def start(self):
+        self.running = True
+        self.thread = threading.Thread(target=self._run, daemon=True)
+        self.thread.start()
+
+    def stop(self):
+        with self.condition:
+            self.running = False
+            self.condition.notify()
+        if self.thread:
+            self.thread.join()
+            self.thread = None
+
+    def _pop_due(self):
+        """Wait until at least one entry is due and return all (kind, reminder) pairs that are."""
+        with self.condition:
+            while self.running:
+                now = time.time()
+                due = []
+                while self.heap and self.heap[0][0] <= now:
+                    _, _, kind, reminder = heapq.heappop(self.heap)
+                    reminder_id = reminder.get("id")
+                    if reminder_id in self.cancelled:
+                        if kind == DUE:
+                            self.cancelled.discard(reminder_id)  # Its last entry is gone
+                        continue
+                    due.append((kind, reminder))
+                if due:
+                    return due
+                self.condition.wait(self.heap[0][0] - now if self.heap else None)
+            return []
+
+    def _run(self):
+        while self.running:
+            for kind, reminder in self._pop_due():
+                try:
+                    if kind == DUE:
+                        self.on_due(reminder)
+                    else:
+                        self.on_upcoming(reminder)
+                except Exception as e:
+                    print(f"Error handling reminder {reminder}: {str(e)}")
+
+
+def benchmark_reminder_scheduler(pending=10_000, due_soon=20):
+    """Compare the old 5 second JSON polling tick with the heap scheduler, with `pending` reminders."""
+    now = time.time()
+    far_future = [{"name": f"Reminder {i}", "created_at": now, "reminder_at": now + 86400 + i} for i in range(pending)]
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "reminders.json")
+        with open(path, "w") as f:
+            json.dump(far_future, f)
+        ticks = 20
+        start = time.perf_counter()
+        for _ in range(ticks):
+            with open(path) as f:
+                reminders = json.load(f)
+            [r for r in reminders if reminder_timestamp(r) <= time.time()]
+        poll_tick = (time.perf_counter() - start) / ticks
+
+    fired = []
+    scheduler = ReminderScheduler(lambda reminder: fired.append(time.time() - reminder["reminder_at"]))
+    start = time.perf_counter()
+    scheduler.load(far_future)
+    load_time = time.perf_counter() - start
+    scheduler.start()
+
+    start = time.perf_counter()
+    now = time.time()
+    for i in range(due_soon):
+        scheduler.add({"name": f"Due soon {i}", "created_at": now, "reminder_at": now + 0.05 + i * 0.02})
+    add_time = (time.perf_counter() - start) / due_soon
+    deadline = time.time() + 5
+    while len(fired) < due_soon and time.time() < deadline:
+        time.sleep(0.01)
+    scheduler.stop()
+
+    lateness = sorted(fired)
+    print(f"{pending} pending reminders")
+    print(f"  Polling: {poll_tick * 1000:.1f} ms per 5 s tick (reminders fire up to 5 s late)")
+    print(f"  Heap:    load {load_time * 1000:.1f} ms once, add {add_time * 1e6:.1f} us, "
+          f"no work between reminders")
+    if lateness:
+        print(f"  Heap firing lateness over {len(lateness)} reminders: "
+              f"p50 {lateness[len(lateness) // 2] * 1000:.2f} ms, max {lateness[-1] * 1000:.2f} ms")
+
+
+if __name__ == "__main__":
+    benchmark_reminder_scheduler()
@@ -0,0 +1,118 @@
+import time
+import random
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from google.api_core import exceptions as core_exceptions
+
+# Client errors that are worth retrying; every other 4xx is treated as fatal
+RETRYABLE_CLIENT_ERRORS = (
+    core_exceptions.TooManyRequests,
+    core_exceptions.ResourceExhausted,
+    core_exceptions.Aborted,
+)
+
+
+class RetryPolicy:
+    """Deadline-aware retries with exponential backoff, full jitter and optional hedging.
+
+    attempt(is_first, timeout) is called for each try. When hedging is enabled and the first
+    attempt is slower than the recent p95 latency, a duplicate attempt is started and whichever
+    succeeds first wins; attempts after the first are told so they can run on their own state.
+
+    call(attempt, bounded=True) runs every attempt on the executor and stops waiting for it after
+    an even share of the time left, so a stalled attempt still leaves room to retry. This is for
+    calls whose own timeout is longer than the deadline (e.g. a stream, which only has to start
+    within it).
+    """
+
+    def __init__(self, max_attempts=3, deadline=30.0, base_delay=0.5, max_delay=4.0,
+                 hedge=False, hedge_quantile=0.95, min_hedge_delay=1.0, min_samples=5):
+        self.max_attempts = max_attempts
+        self.deadline = deadline
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.hedge = hedge
+        self.hedge_quantile = hedge_quantile
+        self.min_hedge_delay = min_hedge_delay
+        self.min_samples = min_samples
+        self.latencies = deque(maxlen=50)
+        self.executor = ThreadPoolExecutor(max_workers=4, thread_name_prefix="hedged-request")
+
+    @staticmethod
+    def is_retryable(error):
+        if isinstance(error, RETRYABLE_CLIENT_ERRORS):
+            return True
+        if isinstance(error, core_exceptions.ClientError):
+            return False
+        # Blocked prompts and stopped candidates will fail the same way every time
+        if type(error).__name__ in ("BlockedPromptException", "StopCandidateException"):
+            return False
+        return True
+
+    def backoff(self, retry):
+        """Full-jitter exponential backoff for the given retry number (1-based)."""
+        return random.uniform(0, min(self.max_delay, self.base_delay * 2 ** (retry - 1)))
+
+    def hedge_delay(self):
+        """Delay before a hedged request is sent, or None if hedging is off or there is too little data."""
+        if not self.hedge or len(self.latencies) < self.min_samples:
+            return None
+        latencies = sorted(self.latencies)
+        index = min(int(len(latencies) * self.hedge_quantile), len(latencies) - 1)
+        return max(latencies[index], self.min_hedge_delay)
+
+    def call(self, attempt, bounded=False):
+        deadline_at = time.monotonic() + self.deadline
+        last_error = None
+        for attempt_number in range(self.max_attempts):
+            remaining = deadline_at - time.monotonic()
+            if remaining <= 0:
+                break
+
+            start_time = time.monotonic()
+            try:
+                timeout = remaining / (self.max_attempts - attempt_number) if bounded else remaining
+                result = self._run_attempt(attempt, attempt_number == 0, timeout, bounded)
+                self.latencies.append(time.monotonic() - start_time)
+                return result
+            except Exception as e:
+                last_error = e
+                if not self.is_retryable(e):
+                    print(f"Fatal error, not retrying: {str(e)}")
+                    raise
+
+            delay = self.backoff(attempt_number + 1)
+            if time.monotonic() + delay >= deadline_at:
+                break
+            print(f"Error: {str(last_error)}. Retrying in {delay:.2f}s ({attempt_number + 1}/{self.max_attempts - 1})...")
+            time.sleep(delay)
+
+        print("Retries exhausted or deadline reached.")
+        raise last_error if last_error else TimeoutError("Deadline reached before the request could be sent")
+
+    def _run_attempt(self, attempt, is_first, timeout, bounded=False):
+        hedge_delay = self.hedge_delay()
+        if hedge_delay is not None and hedge_delay >= timeout:
+            hedge_delay = None
+        if hedge_delay is None and not bounded:
+            return attempt(is_first, timeout)
+
+        futures = [self.executor.submit(attempt, is_first, timeout)]
+        if hedge_delay is not None:
+            done, _ = wait(futures, timeout=hedge_delay)
+            if not done:
+                print(f"No response after {hedge_delay:.2f}s, sending a hedged request")
+                futures.append(self.executor.submit(attempt, False, timeout - hedge_delay))
+
+        # Take the first attempt that succeeds; the loser is left to finish in the background
+        pending = set(futures)
+        error = None
+        while pending:
+            done, pending = wait(pending, timeout=timeout, return_when=FIRST_COMPLETED)
+            if not done:
+                raise TimeoutError(f"No response within {timeout:.2f}s")
+            for future in done:
+                if future.exception() is None:
+                    return future.result()
+                error = error or future.exception()
+        raise error
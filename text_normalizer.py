@@ -0,0 +1,165 @@
+import re
+import time
+
+# Symbols that TTS would read out as full characters
+SYMBOL_TABLE = str.maketrans("", "", "*#@^~`|")
+
+EMOJI_RANGES = (
+    "\U0001F600-\U0001F64F"  # emoticons
+    "\U0001F300-\U0001F5FF"  # symbols & pictographs
+    "\U0001F680-\U0001F6FF"  # transport & map symbols
+    "\U0001F1E0-\U0001F1FF"  # flags (iOS)
+    "\U00002702-\U000027B0"
+    "\U000024C2-\U0001F251"
+)
+
+# Markup that str.translate cannot handle, removed with one pattern:
+#   link   - markdown links, replaced by their text
+#   bullet - list markers at the start of a line
+#   strip  - emojis and the symbols in SYMBOL_TABLE (for text that is not ASCII)
+MARKUP_PATTERN = re.compile(
+    r"\[(?P<link>[^\]]*)\]\([^)]*\)"
+    r"|(?P<bullet>\n[ \t]*[-+][ \t]+)"
+    r"|[*#@^~`|" + EMOJI_RANGES + r"]+"
+)
+
+
+def _replace(match):
+    if match.lastgroup == "link":
+        return match.group("link")
+    if match.lastgroup == "bullet":
+        return " "
+    return ""
+
+
+def _clean(text, line_start=True):
+    if text.isascii():
+        # No emojis possible, so the translate table's ASCII fast path can strip the symbols
+        text = text.translate(SYMBOL_TABLE)
+        if "](" not in text and "- " not in text and "+ " not in text:
+            return text
+    # Treat the start of the text as the start of a line so a leading list marker is removed too
+    return MARKUP_PATTERN.sub(_replace, "\n" + text if line_start else text)
+
+
+def normalize(text):
+    """Clean text for speech synthesis: strip symbols, emojis and markdown, and collapse whitespace."""
+    return " ".join(_clean(text).split())
+
+
+class StreamingNormalizer:
+    """Normalizes text fed in arbitrary chunks, giving the same result as normalize() on the whole text.
+
+    The tail of each chunk that could still change once more text arrives (the last partial
+    word, a dangling list marker, or an unfinished markdown link) is held back until the next
+    feed() or flush().
+    """
+
+    def __init__(self):
+        self.pending = ""
+        self.started = False
+
+    def feed(self, chunk):
+        text = self.pending + chunk
+
+        # Only hand out text up to the last whitespace, minus any list marker right before it
+        cut = max(text.rfind(" "), text.rfind("\n"), text.rfind("\t"), 0)
+        while cut > 0 and text[cut - 1].isspace():
+            cut -= 1
+        if cut > 0 and text[cut - 1] in "-+" and (cut == 1 or text[cut - 2].isspace()):
+            cut -= 1
+            while cut > 0 and text[cut - 1].isspace():
+                cut -= 1
+        open_link = text.rfind("[", 0, cut)
+        if open_link >= 0 and ")" not in text[open_link:cut]:
+            cut = open_link
+
+        self.pending = text[cut:]
+        return self._emit(text[:cut])
+
+    def flush(self):
+        ready, self.pending = self.pending, ""
+        return self._emit(ready)
+
+    def _emit(self, text):
+        words = _clean(text, line_start=not self.started).split()
+        if not words:
+            return ""
+        # Held-back text always starts at whitespace, so later pieces are separated by a space
+        prefix = " " if self.started else ""
+        self.started = True
+        return prefix + " ".join(words)
+
+
+# A sentence ends at terminal punctuation followed by whitespace, or at a line break
+SENTENCE_BOUNDARY = re.compile(r'(?<=[.!?])\s+|\n+')
+
+
+class SentenceSplitter:
+    """Buffers streamed text and hands back complete sentences as soon as they are available."""
+
+    def __init__(self):
+        self.buffer = ""
+
+    def feed(self, text):
+        self.buffer += text
+        pieces = SENTENCE_BOUNDARY.split(self.buffer)
+        # The last piece may still be growing, so keep it until more text (or the end of the stream) arrives
+        self.buffer = pieces.pop()
+        return [piece for piece in pieces if piece.strip()]
+
+    def flush(self):
+        remaining, self.buffer = self.buffer, ""
+        return [remaining] if remaining.strip() else []
+
+
+def split_sentences(text):
+    """Split a complete piece of text into sentences."""
+    return [sentence for sentence in SENTENCE_BOUNDARY.split(text) if sentence.strip()]
+
+
+def _legacy_clean(text):
+    """The cleanup previously done inline in GeminiAPI.generate_response, kept for benchmarking."""
+    cleaned_text = text.replace('\n', '').strip()
+    for symbol in ['*', '#', '@', '^', '~', '`', '|']:
+        cleaned_text = cleaned_text.replace(symbol, '')
+    emoji_pattern = re.compile("[" + EMOJI_RANGES + "]+", flags=re.UNICODE)
+    cleaned_text = emoji_pattern.sub(r'', cleaned_text)
+    return re.sub(r'\s+', ' ', cleaned_text).strip()
+
+
+def benchmark_normalizer(paragraphs=20, iterations=500):
+    """Compare normalize() against the previous inline cleanup on a long multi-paragraph reply."""
+    paragraph = ("## Weather for **Newcastle** 🌦️\n"
+                 "- Today it will be *mostly cloudy* with a high of 14 degrees and a low of 8.\n"
+                 "- Tomorrow looks brighter, see [the forecast](https://example.com/forecast) for details. 😀\n"
+                 "Remember your umbrella   if you're heading out this evening!\n\n")
+    plain_paragraph = ("The weather in Newcastle today will be mostly cloudy with a high of 14 degrees and a low of 8. "
+                       "Tomorrow looks brighter, so it should be a good day for a walk along the quayside.\n\n")
+
+    for name, text in (("markdown and emojis", paragraph * paragraphs), ("plain text", plain_paragraph * paragraphs)):
+        start = time.perf_counter()
+        for _ in range(iterations):
+            _legacy_clean(text)
+        legacy = (time.perf_counter() - start) / iterations
+
+        start = time.perf_counter()
+        for _ in range(iterations):
+            normalize(text)
+        single_pass = (time.perf_counter() - start) / iterations
+
+        start = time.perf_counter()
+        for _ in range(iterations):
+            stream = StreamingNormalizer()
+            for i in range(0, len(text), 40):
+                stream.feed(text[i:i + 40])
+            stream.flush()
+        streaming = (time.perf_counter() - start) / iterations
+
+        print(f"{name} ({len(text)} characters)")
+        print(f"  Legacy cleanup:      {legacy * 1e6:8.1f} us")
+        print(f"  normalize():         {single_pass * 1e6:8.1f} us ({legacy / single_pass:.1f}x)")
+        print(f"  StreamingNormalizer: {streaming * 1e6:8.1f} us (40 character chunks)")
+
+if __name__ == "__main__":
+    benchmark_normalizer()
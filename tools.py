@@ -80,6 +80,15 @@ class Tools:
             list: A list of reminders matching the criteria
         """
         return reminders.get_reminders(mode, start_date, end_date, limit)
+
+    @staticmethod
+    def delete_reminder(reminder_id: int) -> str:
+        """Delete a reminder.
+
+        Args:
+            reminder_id: The id of the reminder, as returned by get_reminders
+        """
+        return reminders.delete_reminder(reminder_id)
         
     @classmethod
     def get_available_tools(cls):
@@ -0,0 +1,107 @@
+import os
+import hashlib
+import tempfile
+import threading
+from collections import OrderedDict
+from text_normalizer import normalize
+
+
+class TTSCache:
+    """Persistent, content-addressed cache of synthesized speech with LRU eviction.
+
+    Entries are keyed on the normalized text plus every setting that changes the audio,
+    stored as one file per entry, and evicted least-recently-used first once either the
+    total size or the number of entries goes over its limit.
+    """
+
+    def __init__(self, cache_dir="tts_cache", max_bytes=50 * 1024 * 1024, max_entries=1000):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()  # key -> (path, size), least recently used first
+        self._total_bytes = 0
+        os.makedirs(cache_dir, exist_ok=True)
+
+        # Rebuild the LRU order from modification times, which are bumped on every hit
+        files = []
+        for name in os.listdir(cache_dir):
+            path = os.path.join(cache_dir, name)
+            if name.endswith(".tmp"):
+                os.remove(path)
+                continue
+            stat = os.stat(path)
+            files.append((stat.st_mtime, os.path.splitext(name)[0], path, stat.st_size))
+        for _, key, path, size in sorted(files):
+            self._entries[key] = (path, size)
+            self._total_bytes += size
+        self._evict()
+
+    @staticmethod
+    def make_key(text, engine, voice, speed, sample_rate=None):
+        material = "\x1f".join([normalize(text), engine, voice, str(speed), str(sample_rate)])
+        return hashlib.sha256(material.encode("utf-8")).hexdigest()
+
+    def get(self, key):
+        """Return the cached audio bytes for key, or None."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or not os.path.exists(entry[0]):
+                if entry is not None:
+                    self._remove(key)
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+        try:
+            os.utime(entry[0])
+            with open(entry[0], "rb") as f:
+                return f.read()
+        except FileNotFoundError:
+            return None  # Evicted by another thread in the meantime
+
+    def put(self, key, data, extension="mp3"):
+        """Store audio bytes under key and return the path of the cached file."""
+        path = os.path.join(self.cache_dir, f"{key}.{extension}")
+        # Each writer gets its own temp file, so threads putting the same key don't trip over each other
+        fd, temp_path = tempfile.mkstemp(dir=self.cache_dir, suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                f.write(data)
+            os.replace(temp_path, path)
+        except BaseException:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+            raise
+
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+            self._entries[key] = (path, len(data))
+            self._total_bytes += len(data)
+            self._evict(keep=key)
+        return path
+
+    def stats(self):
+        total = self.hits + self.misses
+        hit_rate = self.hits / total if total else 0.0
+        return {"hits": self.hits, "misses": self.misses, "hit_rate": hit_rate,
+                "entries": len(self._entries), "bytes": self._total_bytes}
+
+    def _evict(self, keep=None):
+        while self._entries and (self._total_bytes > self.max_bytes or len(self._entries) > self.max_entries):
+            key = next(iter(self._entries))
+            if key == keep:
+                break
+            path, _ = self._entries[key]
+            self._remove(key)
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+
+    def _remove(self, key):
+        _, size = self._entries.pop(key)
+        self._total_bytes -= size
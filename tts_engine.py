@@ -3,11 +3,76 @@ import time
 import threading
 import queue
 import os
+import io
 import uuid
+import wave
 from google.cloud import texttospeech
 from datetime import datetime
 from pathlib import Path
-from openai import OpenAI
+from collections import namedtuple
+from openai import OpenAI, APIStatusError
+from tts_cache import TTSCache
+from text_normalizer import split_sentences
+
+# Synthesis settings; every one of them is part of the audio cache key
+GOOGLE_VOICE = "en-GB-Neural2-B"
+GOOGLE_SPEAKING_RATE = 1.05
+GOOGLE_SAMPLE_RATE = 24000
+GOOGLE_AUDIO_ENCODING = "OGG_OPUS"  # Small and quick to decode; "MP3" also works
+OPENAI_MODEL = "eleven-turbo-v2"
+OPENAI_VOICE = "Lily"  # You can change this or make it configurable
+OPENAI_SPEED = 1.10
+OPENAI_RESPONSE_FORMAT = "mp3"  # "opus" where the provider supports it
+
+# (file extension, pygame name hint) for each requested encoding. Opus needs its own hint:
+# with "ogg" SDL_mixer tries the Vorbis decoder and rejects the stream
+AUDIO_FORMATS = {
+    "OGG_OPUS": ("ogg", "opus"), "MP3": ("mp3", "mp3"), "LINEAR16": ("wav", "wav"),
+    "opus": ("ogg", "opus"), "mp3": ("mp3", "mp3"), "wav": ("wav", "wav"),
+}
+
+# Synthesized audio is played from memory; set SAVE_AUDIO_FILES to also keep copies in temp_audio for debugging
+SAVE_AUDIO_FILES = False
+TEMP_AUDIO_MAX_BYTES = 20 * 1024 * 1024
+
+SYNTHESIS_WORKERS = 3  # Sentences synthesized in parallel; playback order is restored by the reorder buffer
+
+# Synthesized audio held in memory, with the format pygame should decode it as
+AudioClip = namedtuple("AudioClip", ["data", "format"])
+
+# A reminder queued for playback, with its speech if it was rendered ahead of time
+ReminderAnnouncement = namedtuple("ReminderAnnouncement", ["clip"])
+
+# Streaming playback of OpenAI-compatible TTS: raw 16-bit mono PCM is played as it downloads
+STREAM_OPENAI_AUDIO = True
+STREAM_SAMPLE_RATE = 24000  # The sample rate of the "pcm" response format
+STREAM_SEGMENT_MS = 100  # Size of each sound queued on the mixer channel
+STREAM_JITTER_BUFFER_MS = 200  # Audio buffered before playback starts, to ride out network hiccups
+STREAM_SEGMENT_BYTES = STREAM_SAMPLE_RATE * 2 * STREAM_SEGMENT_MS // 1000
+# HTTP statuses meaning the provider can't stream "pcm" at all; anything else is retried on the next sentence
+STREAM_UNSUPPORTED_STATUSES = (400, 404, 415, 422)
+
+# pygame events posted when music or the stream channel finishes, so playback can block instead of polling
+MUSIC_END_EVENT = pygame.USEREVENT + 1
+STREAM_END_EVENT = pygame.USEREVENT + 2
+END_EVENT_TIMEOUT_MS = 500  # Safety net in case an end event is missed
+
+
+class StreamingClip:
+    """Audio that is still downloading. The synthesis worker writes chunks, the playback thread reads them."""
+
+    def __init__(self):
+        self.chunks = queue.Queue()
+        self.received_bytes = 0
+        self.failed = False
+
+    def write(self, data):
+        self.received_bytes += len(data)
+        self.chunks.put(data)
+
+    def close(self, failed=False):
+        self.failed = failed
+        self.chunks.put(None)
 
 class TTSEngine:
     def __init__(self):
@@ -17,19 +82,54 @@ class TTSEngine:
         os.environ['GOOGLE_APPLICATION_CREDENTIALS'] = os.getenv('GOOGLE_CREDENTIALS')
         self.client = texttospeech.TextToSpeechClient()
         
-        pygame.mixer.init()
+        # Mono 16-bit at the streaming rate, so streamed PCM can be handed to the mixer as-is
+        pygame.mixer.init(frequency=STREAM_SAMPLE_RATE, size=-16, channels=1)
+        self.stream_openai_audio = STREAM_OPENAI_AUDIO and pygame.mixer.get_init() == (STREAM_SAMPLE_RATE, -16, 1)
+        pygame.mixer.set_reserved(1)
+        self.stream_channel = pygame.mixer.Channel(0)
+        self.stop_count = 0  # Bumped by stop() so a stream being played knows to give up
         self.generation_queue = queue.Queue()
         self.play_queue = queue.Queue()
         self.is_speaking = False
-        self.generation_thread = threading.Thread(target=self._process_generation_queue, daemon=True)
+
+        # Set whenever nothing is queued, being synthesized or playing; see wait_until_idle()
+        self.idle_condition = threading.Condition()
+        self.idle_event = threading.Event()
+        self.idle_event.set()
+
+        # While suspended (after a barge-in) new text is dropped instead of queued
+        self.suspended = False
+        # Called with (pcm_bytes, sample_rate) for streamed audio as it is sent to the speaker, e.g. for echo suppression
+        self.playback_listeners = []
+        # Called with no arguments each time everything queued has been spoken
+        self.idle_listeners = []
+
+        # Every queued chunk gets a sequence number; finished chunks wait in the reorder buffer
+        # until all earlier ones have been handed to the play queue
+        self.sequence_lock = threading.Lock()
+        self.next_sequence = 0
+        self.next_to_play = 0
+        self.reorder_buffer = {}
+
+        self.generation_threads = [
+            threading.Thread(target=self._process_generation_queue, daemon=True)
+            for _ in range(SYNTHESIS_WORKERS)
+        ]
         self.playback_thread = threading.Thread(target=self._process_play_queue, daemon=True)
-        self.generation_thread.start()
+        for thread in self.generation_threads:
+            thread.start()
         self.playback_thread.start()
         self.temp_dir = "temp_audio"
-        os.makedirs(self.temp_dir, exist_ok=True)
+        # Debug copies go to a bounded spool that evicts the oldest files, so it can't grow forever
+        self.audio_spool = TTSCache(self.temp_dir, max_bytes=TEMP_AUDIO_MAX_BYTES) if SAVE_AUDIO_FILES else None
+        self.audio_cache = TTSCache("tts_cache")
         print("TTSEngine initialized.")
         self.notification_sound = pygame.mixer.Sound("reminder_sound.mp3")
 
+        # Reminder speech synthesized ahead of time, by reminder id: (text, AudioClip or None while in flight)
+        self.prerendered = {}
+        self.prerender_lock = threading.Lock()
+
         # Initialize OpenAI client
         self.openai_client = OpenAI(
             api_key=os.getenv('OPENAI_API_KEY_DIFF'),
@@ -38,76 +138,172 @@ class TTSEngine:
 
     def speak(self, text):
         if isinstance(text, str) and text.strip():
-            self.generation_queue.put(text)
+            self._queue_sentences(text, False, None)
         else:
             print("Error: Invalid or empty text input for TTS.")
 
-    def speak_openai(self, text):
+    def speak_openai(self, text, on_start=None):
+        """Queue text for OpenAI TTS. on_start, if given, is called when its audio begins playing."""
         if isinstance(text, str) and text.strip():
-            self.generation_queue.put((text, True))  # True indicates OpenAI TTS
+            self._queue_sentences(text, True, on_start)  # True indicates OpenAI TTS
         else:
             print("Error: Invalid or empty text input for TTS.")
 
+    def _queue_sentences(self, text, use_openai, on_start):
+        """Split text into sentences and queue each one, in order, for synthesis."""
+        if self.suspended:
+            print(f"TTS suspended, not speaking: '{text}'")
+            return
+        with self.idle_condition, self.sequence_lock:
+            self.idle_event.clear()
+            for sentence in split_sentences(text):
+                self.generation_queue.put((self.next_sequence, sentence, use_openai, on_start))
+                self.next_sequence += 1
+                on_start = None  # Only the first sentence marks the start of playback
+
+    def wait_until_idle(self, timeout=None):
+        """Block until everything queued has been spoken. Returns False if the timeout expired first."""
+        return self.idle_event.wait(timeout)
+
+    def _notify_if_idle(self):
+        with self.idle_condition:
+            # unfinished_tasks counts items from put() until task_done(), including the one being worked on
+            if (self.generation_queue.unfinished_tasks == 0 and not self.reorder_buffer
+                    and self.play_queue.unfinished_tasks == 0):
+                self.is_speaking = False
+                self.idle_event.set()
+                self.idle_condition.notify_all()
+                for listener in self.idle_listeners:
+                    listener()
+
     def _process_generation_queue(self):
         while True:
-            item = self.generation_queue.get()
-            if isinstance(item, tuple):
-                text, use_openai = item
-            else:
-                text, use_openai = item, False
-            
-            if use_openai:
-                audio_file = self._generate_audio_openai(text)
-            else:
-                audio_file = self._generate_audio(text)
-            
-            self.play_queue.put((audio_file, text))
-            self.generation_queue.task_done()
+            sequence, text, use_openai, on_start = self.generation_queue.get()
+            audio_file = None
+            try:
+                if use_openai and self.stream_openai_audio:
+                    self._stream_audio_openai(sequence, text, on_start)
+                    sequence = None  # Released by the streaming path itself
+                elif use_openai:
+                    audio_file = self._generate_audio_openai(text)
+                else:
+                    audio_file = self._generate_audio(text)
+            except Exception as e:
+                print(f"Error synthesizing '{text}': {str(e)}")
+            finally:
+                # Always account for the chunk, or later ones stay stuck in the reorder buffer and TTS never goes idle
+                if sequence is not None:
+                    self._release_in_order(sequence, (audio_file, text, on_start))
+                self.generation_queue.task_done()
+                self._notify_if_idle()
+
+    def _release_in_order(self, sequence, item):
+        """Put a finished chunk in the reorder buffer and release every chunk that is now next in line."""
+        with self.sequence_lock:
+            if sequence < self.next_to_play:
+                return  # Playback was stopped after this chunk was queued
+            self.reorder_buffer[sequence] = item
+            while self.next_to_play in self.reorder_buffer:
+                audio_file, text, on_start = self.reorder_buffer.pop(self.next_to_play)
+                self.next_to_play += 1
+                if audio_file is None:
+                    print(f"Skipping chunk that failed to synthesize: '{text}'")
+                    continue
+                self.play_queue.put((audio_file, text, on_start))
+
+    def _enable_end_events(self):
+        """Have pygame post events when playback ends. Needs the (headless) display subsystem for its event queue."""
+        try:
+            os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+            pygame.display.init()
+            pygame.event.set_blocked(None)
+            pygame.event.set_allowed([MUSIC_END_EVENT, STREAM_END_EVENT])
+            pygame.mixer.music.set_endevent(MUSIC_END_EVENT)
+            self.stream_channel.set_endevent(STREAM_END_EVENT)
+            return True
+        except pygame.error as e:
+            print(f"End-of-track events unavailable, falling back to polling: {e}")
+            return False
+
+    def _wait_for_end_event(self):
+        """Sleep until music or the stream channel finishes something (or briefly, without events)."""
+        if self.end_events:
+            pygame.event.wait(END_EVENT_TIMEOUT_MS)
+        else:
+            time.sleep(0.02)
+
+    def _wait_for_music(self):
+        while pygame.mixer.music.get_busy():
+            self._wait_for_end_event()
 
     def _process_play_queue(self):
+        # Events are delivered to the thread that initialised the display, so set them up here
+        self.end_events = self._enable_end_events()
         while True:
-            audio_file, text = self.play_queue.get()
+            audio_file, text, on_start = self.play_queue.get()
             self.is_speaking = True
             
             # Wait for any ongoing playback to finish
-            while pygame.mixer.music.get_busy():
-                time.sleep(0.1)
+            self._wait_for_music()
             
-            if audio_file is None:  # Reminder response
-                self._play_notification_sound()
-                success = self._play_audio(self._generate_audio(text), text)
+            if isinstance(audio_file, ReminderAnnouncement):  # Reminder response
+                chime = self._play_notification_sound()
+                clip = audio_file.clip
+                if clip is None:
+                    clip = self._generate_audio(text)  # Not pre-rendered; synthesize while the chime plays
+                while chime and chime.get_busy():
+                    self._wait_for_end_event()
+                self._play_audio(clip, text)
+            elif isinstance(audio_file, StreamingClip):
+                self._play_stream(audio_file, text, on_start=on_start)
+                if audio_file.failed and not audio_file.received_bytes:
+                    # The provider couldn't stream this one, so fall back to the whole-file path
+                    self._play_audio(self._generate_audio_openai(text), text, on_start=on_start)
             else:  # Regular response
-                success = self._play_audio(audio_file, text)
+                self._play_audio(audio_file, text, on_start=on_start)
             
             self.is_speaking = False
             self.play_queue.task_done()
-            if success and audio_file is not None:
-                pass
-                # os.remove(audio_file)  # Clean up the temporary file
+            self._notify_if_idle()
+
+    def _make_clip(self, data, audio_format, cache_key=None):
+        """Wrap synthesized bytes for playback, caching them and keeping a debug copy if enabled."""
+        extension, decoder = AUDIO_FORMATS[audio_format]
+        if cache_key:
+            self.audio_cache.put(cache_key, data, extension)
+        if self.audio_spool:
+            timestamp = datetime.now().strftime("%Y%m%d_%H%M%S_%f")
+            print(f"Saved debug copy to {self.audio_spool.put(timestamp, data, extension)}")
+        return AudioClip(data, decoder)
+
+    def _generate_audio(self, text, use_cache=True):
+        cache_key = TTSCache.make_key(
+            text, f"google:{GOOGLE_AUDIO_ENCODING}", GOOGLE_VOICE, GOOGLE_SPEAKING_RATE, GOOGLE_SAMPLE_RATE
+        )
+        if use_cache:
+            cached_audio = self.audio_cache.get(cache_key)
+            if cached_audio:
+                print(f"Using cached speech for: '{text}'")
+                return AudioClip(cached_audio, AUDIO_FORMATS[GOOGLE_AUDIO_ENCODING][1])
 
-    def _generate_audio(self, text):
         print(f"Converting text to speech: '{text}'")
         
-        # Generate a unique filename for this audio
-        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S_%f")
-        filename = os.path.join(self.temp_dir, f"{timestamp}.mp3")
-        
         # Set the text input to be synthesized
         synthesis_input = texttospeech.SynthesisInput(text=text)
 
         # Build the voice request
         voice = texttospeech.VoiceSelectionParams(
             language_code="en-GB",
-            name="en-GB-Neural2-B"
+            name=GOOGLE_VOICE
         )
 
         # Select the type of audio file you want returned
         audio_config = texttospeech.AudioConfig(
-            audio_encoding=texttospeech.AudioEncoding.MP3,
-            speaking_rate=1.05,
+            audio_encoding=texttospeech.AudioEncoding[GOOGLE_AUDIO_ENCODING],
+            speaking_rate=GOOGLE_SPEAKING_RATE,
             pitch=0.0,
             # effects_profile_id=["headphone-class-device"],
-            sample_rate_hertz=24000
+            sample_rate_hertz=GOOGLE_SAMPLE_RATE
         )
 
         try:
@@ -116,47 +312,163 @@ class TTSEngine:
             )
             
             # The response's audio_content is binary
-            with open(filename, "wb") as out:
-                out.write(response.audio_content)
-            print(f"Speech synthesized and saved to {filename}")
-            return filename
+            print("Speech synthesized.")
+            return self._make_clip(response.audio_content, GOOGLE_AUDIO_ENCODING, cache_key)
         except Exception as e:
             print(f"An error occurred during speech synthesis: {str(e)}")
             return None
 
     def _generate_audio_openai(self, text):
+        cache_key = TTSCache.make_key(text, f"openai:{OPENAI_MODEL}:{OPENAI_RESPONSE_FORMAT}", OPENAI_VOICE, OPENAI_SPEED)
+        cached_audio = self.audio_cache.get(cache_key)
+        if cached_audio:
+            print(f"Using cached OpenAI speech for: '{text}'")
+            return AudioClip(cached_audio, AUDIO_FORMATS[OPENAI_RESPONSE_FORMAT][1])
+
         print(f"Converting text to speech using OpenAI: '{text}'")
         
-        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S_%f")
-        filename = os.path.join(self.temp_dir, f"{timestamp}_openai.mp3")
-        
         try:
             response = self.openai_client.audio.speech.create(
-                model="eleven-turbo-v2",
-                voice="Lily",  # You can change this or make it configurable
+                model=OPENAI_MODEL,
+                voice=OPENAI_VOICE,
                 input=text,
-                speed=1.10
+                speed=OPENAI_SPEED,
+                response_format=OPENAI_RESPONSE_FORMAT
             )
-            response.stream_to_file(filename)
-            print(f"OpenAI speech synthesized and saved to {filename}")
-            return filename
+            print("OpenAI speech synthesized.")
+            return self._make_clip(response.content, OPENAI_RESPONSE_FORMAT, cache_key)
         except Exception as e:
             print(f"An error occurred during OpenAI speech synthesis: {str(e)}")
             return None
 
-    def _play_audio(self, audio_file, text, retry_count=0):
+    def _stream_audio_openai(self, sequence, text, on_start):
+        """Synthesize with OpenAI-compatible TTS, handing audio to the player while it downloads."""
+        cache_key = TTSCache.make_key(text, f"openai:{OPENAI_MODEL}:pcm", OPENAI_VOICE, OPENAI_SPEED, STREAM_SAMPLE_RATE)
+        cached_audio = self.audio_cache.get(cache_key)
+        if cached_audio:
+            print(f"Using cached OpenAI speech for: '{text}'")
+            self._release_in_order(sequence, (AudioClip(cached_audio, "wav"), text, on_start))
+            return
+
+        # Release the clip straight away; the player starts as soon as it is next in line and has enough data
+        clip = StreamingClip()
+        self._release_in_order(sequence, (clip, text, on_start))
+        print(f"Streaming text to speech using OpenAI: '{text}'")
+
+        pcm = bytearray()
+        try:
+            with self.openai_client.audio.speech.with_streaming_response.create(
+                model=OPENAI_MODEL,
+                voice=OPENAI_VOICE,
+                input=text,
+                speed=OPENAI_SPEED,
+                response_format="pcm"
+            ) as response:
+                for chunk in response.iter_bytes(STREAM_SEGMENT_BYTES):
+                    pcm.extend(chunk)
+                    clip.write(chunk)
+        except Exception as e:
+            print(f"An error occurred during OpenAI speech streaming: {str(e)}")
+            if isinstance(e, APIStatusError) and e.status_code in STREAM_UNSUPPORTED_STATUSES and not clip.received_bytes:
+                print("Provider does not support streaming, disabling streaming playback for OpenAI TTS.")
+                self.stream_openai_audio = False
+            clip.close(failed=True)
+            return
+
+        clip.close()
+        try:
+            self.audio_cache.put(cache_key, self._pcm_to_wav(bytes(pcm)), "wav")
+        except Exception as e:
+            print(f"Error caching streamed speech: {str(e)}")
+
+    @staticmethod
+    def _pcm_to_wav(pcm):
+        buffer = io.BytesIO()
+        with wave.open(buffer, 'wb') as wf:
+            wf.setnchannels(1)
+            wf.setsampwidth(2)
+            wf.setframerate(STREAM_SAMPLE_RATE)
+            wf.writeframes(pcm)
+        return buffer.getvalue()
+
+    def _play_stream(self, clip, text, on_start=None):
+        """Play a StreamingClip on the reserved mixer channel as its chunks arrive."""
+        print(f"Streaming audio: '{text}'")
+        stop_count = self.stop_count
+        channel = self.stream_channel
+        buffer = bytearray()
+        segments = []
+        started = False
+        finished = False
+        jitter_segments = max(STREAM_JITTER_BUFFER_MS // STREAM_SEGMENT_MS, 1)
+
+        while True:
+            if self.stop_count != stop_count:
+                channel.stop()
+                return False
+
+            if not finished:
+                try:
+                    chunk = clip.chunks.get(timeout=STREAM_SEGMENT_MS / 1000 / 4)
+                except queue.Empty:
+                    chunk = b""
+                if chunk is None:
+                    finished = True
+                else:
+                    buffer.extend(chunk)
+
+            # Cut whole segments off the buffer (and the remainder once the download is done)
+            while len(buffer) >= STREAM_SEGMENT_BYTES or (finished and len(buffer) >= 2):
+                size = min(STREAM_SEGMENT_BYTES, len(buffer) - len(buffer) % 2)
+                segment = bytes(buffer[:size])
+                segments.append((segment, pygame.mixer.Sound(buffer=segment)))
+                del buffer[:size]
+
+            if not started and (len(segments) >= jitter_segments or (finished and segments)):
+                started = True
+                if on_start:
+                    on_start()
+
+            # Keep the channel fed: one segment playing, one queued behind it
+            while started and segments:
+                if not channel.get_busy():
+                    segment, sound = segments.pop(0)
+                    channel.play(sound)
+                elif channel.get_queue() is None:
+                    segment, sound = segments.pop(0)
+                    channel.queue(sound)
+                else:
+                    break
+                for listener in self.playback_listeners:
+                    listener(segment, STREAM_SAMPLE_RATE)
+
+            if finished:
+                if not segments and not channel.get_busy():
+                    break
+                self._wait_for_end_event()
+
+        print("Finished streaming audio.")
+        return started and not clip.failed
+
+    def _play_audio(self, audio_file, text, retry_count=0, on_start=None):
         if audio_file is None:
             print("No audio file to play.")
             return False
         
-        print(f"Playing audio: {audio_file}")
         try:
-            pygame.mixer.music.load(audio_file)
+            if isinstance(audio_file, AudioClip):
+                # Decode straight from memory rather than going through a file
+                print(f"Playing audio: '{text}' ({len(audio_file.data)} bytes of {audio_file.format})")
+                pygame.mixer.music.load(io.BytesIO(audio_file.data), audio_file.format)
+            else:
+                print(f"Playing audio: {audio_file}")
+                pygame.mixer.music.load(audio_file)
             pygame.mixer.music.play()
+            if on_start:
+                on_start()
             
             # Wait for the audio to finish playing
-            while pygame.mixer.music.get_busy():
-                time.sleep(0.1)
+            self._wait_for_music()
             print("Finished playing audio.")
             
             return True
@@ -164,23 +476,117 @@ class TTSEngine:
             print(f"Error playing audio: {e}")
             if retry_count < 2:
                 print(f"Regenerating audio and trying again (attempt {retry_count + 1})...")
-                new_audio_file = self._generate_audio(text)
-                return self._play_audio(new_audio_file, text, retry_count + 1)
+                new_audio_file = self._generate_audio(text, use_cache=False)
+                return self._play_audio(new_audio_file, text, retry_count + 1, on_start=on_start)
             else:
                 print("Max retry limit reached. Skipping this response.")
                 return False
 
     def _play_notification_sound(self):
-        """Play the notification sound."""
-        self.notification_sound.play()
+        """Play the notification sound and return the channel it is playing on."""
+        channel = self.notification_sound.play()
+        if channel and self.end_events:
+            channel.set_endevent(STREAM_END_EVENT)  # Wakes _wait_for_end_event when the chime ends
+        return channel
+
+    def prerender_reminder(self, reminder_id, text):
+        """Synthesize a reminder's speech in the background so it is ready when the reminder fires."""
+        with self.prerender_lock:
+            if reminder_id in self.prerendered:
+                return
+            self.prerendered[reminder_id] = (text, None)
 
-    def queue_reminder_response(self, response: str) -> None:
+        def render():
+            clip = self._generate_audio(text)
+            with self.prerender_lock:
+                # Only keep it if the reminder hasn't been deleted (or fired) in the meantime
+                if reminder_id in self.prerendered and clip is not None:
+                    self.prerendered[reminder_id] = (text, clip)
+                    print(f"Pre-rendered reminder {reminder_id}: '{text}'")
+
+        threading.Thread(target=render, daemon=True).start()
+
+    def discard_prerendered(self, reminder_id):
+        with self.prerender_lock:
+            self.prerendered.pop(reminder_id, None)
+
+    def queue_reminder_response(self, response: str, reminder_id=None) -> None:
         """Queue a reminder response to be read out after the current TTS queue."""
-        self.play_queue.put((None, response))  # Use None for audio_file to indicate a reminder response
+        with self.prerender_lock:
+            text, clip = self.prerendered.pop(reminder_id, (None, None))
+        if text != response:
+            clip = None  # Rendered for different wording
+        with self.idle_condition:
+            self.idle_event.clear()
+            self.play_queue.put((ReminderAnnouncement(clip), response, None))
+
+    def suspend(self):
+        """Stop playback and ignore new text until resume(), e.g. while the rest of an interrupted reply arrives."""
+        self.suspended = True
+        self.stop()
+
+    def resume(self):
+        self.suspended = False
 
     def stop(self):
         print("Stopping audio playback...")
         pygame.mixer.music.stop()
-        self.generation_queue.queue.clear()
-        self.play_queue.queue.clear()
-        print("Audio playback stopped.")
\ No newline at end of file
+        self.stop_count += 1
+        self.stream_channel.stop()
+        with self.sequence_lock:
+            self._drain(self.generation_queue)
+            self.reorder_buffer.clear()
+            # Chunks still being synthesized are dropped when they finish
+            self.next_to_play = self.next_sequence
+        self._drain(self.play_queue)
+        self._notify_if_idle()
+        print("Audio playback stopped.")
+
+    @staticmethod
+    def _drain(q):
+        """Empty a queue, marking each discarded item done so unfinished_tasks stays accurate."""
+        while True:
+            try:
+                q.get_nowait()
+            except queue.Empty:
+                return
+            q.task_done()
+
+
+def test_streaming_latency(runs=3):
+    """Compare time to first audio for whole-file and streamed OpenAI TTS on typical 1-3 sentence replies."""
+    client = OpenAI(api_key=os.getenv('OPENAI_API_KEY_DIFF'), base_url=os.getenv('OPENAI_API_URL_DIFF'))
+    replies = [
+        "It's currently 14 degrees and cloudy in Newcastle.",
+        "Your next reminder is at three o'clock. It's for picking up the dry cleaning.",
+        "The drive to London takes about four and a half hours. Traffic is light on the A1 right now. I've sent the route to your phone.",
+    ]
+    jitter_bytes = STREAM_SAMPLE_RATE * 2 * STREAM_JITTER_BUFFER_MS // 1000
+
+    for reply in replies:
+        file_times, stream_times = [], []
+        for _ in range(runs):
+            start = time.time()
+            client.audio.speech.create(model=OPENAI_MODEL, voice=OPENAI_VOICE, input=reply,
+                                       speed=OPENAI_SPEED, response_format=OPENAI_RESPONSE_FORMAT).content
+            file_times.append(time.time() - start)
+
+            start = time.time()
+            received = 0
+            with client.audio.speech.with_streaming_response.create(
+                model=OPENAI_MODEL, voice=OPENAI_VOICE, input=reply, speed=OPENAI_SPEED, response_format="pcm"
+            ) as response:
+                for chunk in response.iter_bytes(STREAM_SEGMENT_BYTES):
+                    received += len(chunk)
+                    if received >= jitter_bytes:
+                        stream_times.append(time.time() - start)
+                        break
+
+        file_latency = sorted(file_times)[len(file_times) // 2]
+        stream_latency = sorted(stream_times)[len(stream_times) // 2] if stream_times else float("nan")
+        print(f"{len(reply):>4} chars: whole file {file_latency:.2f}s, streamed {stream_latency:.2f}s "
+              f"(saves {file_latency - stream_latency:.2f}s to first audio)")
+
+
+if __name__ == "__main__":
+    test_streaming_latency()
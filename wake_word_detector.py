@@ -1,53 +1,229 @@
 import pvporcupine
-import pvrecorder
 import time
+import math
+import wave
+import threading
+from array import array
+from collections import deque
 from audio_recorder import AudioRecorder
+from audio_capture import AudioCapture
 import pygame
 
+# Echo suppression: a detection during playback must be this many times louder than the expected echo
+ECHO_MARGIN = 2.0
+ECHO_ADAPTATION = 0.05  # How quickly the speaker-to-mic coupling estimate follows the room
+ECHO_WINDOW_SECONDS = 0.6  # Roughly the length of the wake word
+OPAQUE_PLAYBACK_LEVEL = 1000.0  # Reference level assumed while playing audio we have no samples for (mp3/ogg)
+# Longest a reply may keep the barge-in monitor waiting, in case TTS never reports that it is idle
+BARGE_IN_WAIT_TIMEOUT = 300
+
+
+def rms(samples):
+    """Root mean square level of a sequence of 16-bit samples."""
+    if not samples:
+        return 0.0
+    return math.sqrt(sum(sample * sample for sample in samples) / len(samples))
+
+
 class WakeWordDetector:
-    def __init__(self, access_key):
+    def __init__(self, access_key, capture=None, audio_recorder=None, porcupine=None):
         self.access_key = access_key
-        self.porcupine = pvporcupine.create(
+        self.porcupine = porcupine or pvporcupine.create(
             access_key=self.access_key,
             keywords=["jarvis"]
         )
-        self.recorder = pvrecorder.PvRecorder(device_index=-1, frame_length=self.porcupine.frame_length)
-        self.audio_recorder = AudioRecorder(self.access_key)
+        if capture is None:
+            capture = AudioCapture(frame_length=self.porcupine.frame_length)
+            capture.start()
+        self.capture = capture
+        self.audio_recorder = audio_recorder or AudioRecorder(self.access_key, capture)
 
-    def listen(self):
+    def listen(self, reader=None):
         print("Listening for wake word 'Jarvis'...")
-        self.recorder.start()
+        if reader is None:
+            reader = self.capture.reader(self.porcupine.frame_length)
 
         try:
             while True:
-                pcm = self.recorder.read()
+                pcm = reader.read()
+                if pcm is None:
+                    return None  # Capture stopped
                 keyword_index = self.porcupine.process(pcm)
                 
                 if keyword_index >= 0:
                     # Stop the playback
-                    pygame.mixer.music.stop()
+                    if pygame.mixer.get_init():
+                        pygame.mixer.music.stop()
                     print("Wake word detected!")
-                    self.recorder.stop()
-                    # Add a short delay to allow the user to speak
-                    time.sleep(0.1)
                     
-                    # Hand off to audio recorder
-                    wav_file = self.audio_recorder.record(silence_duration=1.0)
+                    # Hand off to audio recorder, which carries on from the very next frame
+                    audio = self.audio_recorder.record(silence_duration=1.0, reader=reader, in_memory=True)
                     
-                    if wav_file:
-                        print(f"Recording saved as {wav_file}")
-                        return wav_file
+                    if audio:
+                        return audio
                     else:
                         print("No audio was recorded.")
                         return None
 
         except KeyboardInterrupt:
             print("Stopping...")
-        finally:
-            self.recorder.stop()
 
     def __del__(self):
         if self.porcupine is not None:
             self.porcupine.delete()
-        if self.recorder is not None:
-            self.recorder.delete()
\ No newline at end of file
+
+
+class EchoSuppressor:
+    """Rejects wake word detections that are more likely Jarvis's own voice than the user's.
+
+    The known playback signal is fed in with add_reference(). For each mic frame the expected
+    echo level is the reference level at that moment times a speaker-to-mic coupling factor,
+    learned while nobody is talking. A detection is only accepted when the mic was clearly
+    louder than that expected echo over the length of the wake word.
+    """
+
+    def __init__(self, sample_rate, frame_length, margin=ECHO_MARGIN, adaptation=ECHO_ADAPTATION):
+        self.sample_rate = sample_rate
+        self.frame_length = frame_length
+        self.margin = margin
+        self.adaptation = adaptation
+        self.coupling = None
+        self.reference = deque()  # (start_time, end_time, level) of played audio
+        window_frames = max(int(ECHO_WINDOW_SECONDS * sample_rate / frame_length), 1)
+        self.mic_levels = deque(maxlen=window_frames)
+        self.echo_levels = deque(maxlen=window_frames)
+
+    def add_reference(self, pcm, sample_rate, start_time=None):
+        """Record a block of 16-bit mono PCM that is about to be played."""
+        samples = array('h', pcm)
+        if start_time is None:
+            start_time = time.time()
+        if self.reference:
+            start_time = max(start_time, self.reference[-1][1])  # Queued audio plays after what is already queued
+        self.reference.append((start_time, start_time + len(samples) / sample_rate, rms(samples)))
+
+    def reference_level(self, now):
+        while self.reference and self.reference[0][1] < now:
+            self.reference.popleft()
+        if self.reference and self.reference[0][0] <= now:
+            return self.reference[0][2]
+        return None
+
+    def process(self, pcm, playing, now=None):
+        """Update the echo estimate with a mic frame. playing says whether anything is being played."""
+        if now is None:
+            now = time.time()
+        mic_level = rms(pcm)
+        reference_level = self.reference_level(now)
+        if reference_level is None:
+            reference_level = OPAQUE_PLAYBACK_LEVEL if playing else 0.0
+
+        expected_echo = reference_level * self.coupling if self.coupling is not None else 0.0
+        self.mic_levels.append(mic_level)
+        self.echo_levels.append(expected_echo)
+
+        # Learn the coupling from frames that look like echo alone (not much louder than expected)
+        if reference_level > 0 and (self.coupling is None or mic_level < self.margin * max(expected_echo, 1.0)):
+            ratio = mic_level / reference_level
+            self.coupling = ratio if self.coupling is None else self.coupling + self.adaptation * (ratio - self.coupling)
+
+    def accept(self):
+        """Whether a detection on the latest frame should be trusted."""
+        expected_echo = sum(self.echo_levels) / len(self.echo_levels) if self.echo_levels else 0.0
+        if expected_echo <= 0:
+            return True
+        mic_level = sum(self.mic_levels) / len(self.mic_levels)
+        return mic_level >= self.margin * expected_echo
+
+
+class BargeInMonitor:
+    """Keeps listening for the wake word while Jarvis is talking, so the user can interrupt.
+
+    start() listens in a background thread. On a detection TTS is stopped, pending synthesis is
+    cancelled and the user's new request is recorded straight away; wait() returns that
+    recording, or None once everything queued has been spoken without an interruption.
+    """
+
+    def __init__(self, detector, tts_engine, echo_suppression=True):
+        self.detector = detector
+        self.tts_engine = tts_engine
+        self.echo_suppressor = None
+        if echo_suppression:
+            self.echo_suppressor = EchoSuppressor(detector.capture.sample_rate, detector.porcupine.frame_length)
+            tts_engine.playback_listeners.append(self.echo_suppressor.add_reference)
+        self.thread = None
+        self.stop_event = threading.Event()
+        # Set once TTS goes idle while wait() is waiting, or once a barge-in has been recorded
+        self.done_event = threading.Event()
+        self.waiting = False
+        self.audio_file = None
+        tts_engine.idle_listeners.append(self._on_tts_idle)
+
+    def process_frame(self, pcm, now=None):
+        """Run one mic frame through the wake word engine. Returns True if this is a barge-in."""
+        if self.echo_suppressor:
+            self.echo_suppressor.process(pcm, self.tts_engine.is_speaking, now)
+        if self.detector.porcupine.process(pcm) < 0:
+            return False
+        if self.echo_suppressor and not self.echo_suppressor.accept():
+            print("Wake word detected during playback, but it looks like echo. Ignoring.")
+            return False
+        return True
+
+    def start(self):
+        self.stop_event.clear()
+        self.done_event.clear()
+        self.waiting = False
+        self.audio_file = None
+        self.thread = threading.Thread(target=self._listen, daemon=True)
+        self.thread.start()
+
+    def wait(self, timeout=BARGE_IN_WAIT_TIMEOUT):
+        """Block until TTS is idle or the user barged in. Returns the barge-in recording, if any."""
+        # TTS may have gone idle between sentences while the reply was still streaming, so only count it from now on
+        self.waiting = True
+        if self.tts_engine.wait_until_idle(timeout=0):
+            self.done_event.set()
+        if not self.done_event.wait(timeout):
+            print(f"Still speaking after {timeout}s, giving up on barge-in.")
+        self.stop_event.set()
+        self.thread.join()  # Lets a barge-in recording that is under way finish
+        return self.audio_file
+
+    def _on_tts_idle(self):
+        if self.waiting:
+            self.done_event.set()
+
+    def _listen(self):
+        reader = self.detector.capture.reader(self.detector.porcupine.frame_length)
+        while not self.stop_event.is_set():
+            pcm = reader.read(timeout=0.5)
+            if pcm is None:
+                continue
+            if self.process_frame(pcm):
+                print("Wake word detected during playback!")
+                self.tts_engine.suspend()
+                self.audio_file = self.detector.audio_recorder.record(silence_duration=1.0, reader=reader, in_memory=True)
+                self.done_event.set()
+                return
+
+
+def simulate_barge_in(monitor, mic_wav, playback_wav=None):
+    """Run a recorded mic WAV (and optionally the audio that was playing) through a monitor.
+
+    Both files must be 16-bit mono at the wake word engine's sample rate. Returns the time in
+    seconds at which a barge-in would have triggered, or None.
+    """
+    frame_length = monitor.detector.porcupine.frame_length
+    with wave.open(mic_wav, 'rb') as wf:
+        sample_rate = wf.getframerate()
+        mic = array('h', wf.readframes(wf.getnframes()))
+    if playback_wav and monitor.echo_suppressor:
+        with wave.open(playback_wav, 'rb') as wf:
+            monitor.echo_suppressor.add_reference(wf.readframes(wf.getnframes()), wf.getframerate(), start_time=0.0)
+
+    for index in range(len(mic) // frame_length):
+        now = index * frame_length / sample_rate
+        if monitor.process_frame(mic[index * frame_length:(index + 1) * frame_length], now=now):
+            return now
+    return None